@@ -1,6 +1,11 @@
-from django.db.models import IntegerChoices
+from django.db.models import IntegerChoices, TextChoices
 
 
 class OTPTypeChoices(IntegerChoices):
     EMAIL_VERIFICATION = 1, "Email Verification"
     FORGOT_PASSWORD = 2, "Forgot Password"
+
+
+class AuthTokenTypeChoices(TextChoices):
+    EXPIRING = "expiring", "Expiring database token"
+    SIGNED = "signed", "Signed stateless token"
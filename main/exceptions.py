@@ -1,4 +1,4 @@
 class OTPAlreadyExistsException(Exception):
     """
-    Raised when an OTP created for a user already exists with another user
+    Raised when no OTP value unused by the user could be created
     """
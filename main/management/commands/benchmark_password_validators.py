@@ -0,0 +1,45 @@
+from timeit import timeit
+
+from django.core.management.base import BaseCommand
+
+from main.validators import get_password_validators, validate_password
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the per call cost of validating a password with validators '
+        'built on every call and with the shared validators'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=200,
+            help='Number of validations timed for each approach'
+        )
+        parser.add_argument(
+            '--password', default='Paword*1', help='Password to validate'
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        password = options['password']
+        validator_classes = [
+            type(validator) for validator in get_password_validators()
+        ]
+
+        def validate_with_new_validators():
+            for validator_class in validator_classes:
+                try:
+                    validator_class().validate(password)
+                except Exception:
+                    pass
+
+        per_call = timeit(validate_with_new_validators, number=iterations)
+        shared = timeit(lambda: validate_password(password), number=iterations)
+        per_call_ms = per_call / iterations * 1000
+        shared_ms = shared / iterations * 1000
+        self.stdout.write(f'Validators built per call: {per_call_ms:.4f} ms/call')
+        self.stdout.write(f'Shared validators:         {shared_ms:.4f} ms/call')
+        self.stdout.write(self.style.SUCCESS(
+            f'Speedup: {per_call_ms / shared_ms:.1f}x'
+        ))
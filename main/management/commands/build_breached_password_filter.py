@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from root.utils.bloom_filter import build_bloom_filter, password_digest
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the breached password Bloom filter from a file with one '
+        'password or SHA-1 hash per line'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='File of breached passwords')
+        parser.add_argument(
+            '--output', default=settings.BREACHED_PASSWORD_FILTER_PATH,
+            help='Filter file to write, defaults to BREACHED_PASSWORD_FILTER_PATH'
+        )
+        parser.add_argument(
+            '--format', choices=('plain', 'sha1'), default='plain',
+            help=(
+                'plain: one password per line. sha1: one hex SHA-1 hash per '
+                'line, anything after a ":" is ignored (HASH:COUNT lists)'
+            )
+        )
+        parser.add_argument(
+            '--false-positive-rate', type=float, default=0.001,
+            help='Fraction of never breached passwords rejected by the filter'
+        )
+
+    def read_digests(self, path: str, input_format: str):
+        with open(path, encoding='utf-8', errors='replace') as file:
+            for line in file:
+                line = line.rstrip('\r\n')
+                if not line:
+                    continue
+                if input_format == 'sha1':
+                    yield bytes.fromhex(line.split(':', 1)[0])
+                else:
+                    yield password_digest(line)
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError(
+                'Pass --output or set BREACHED_PASSWORD_FILTER_PATH'
+            )
+        if not 0 < options['false_positive_rate'] < 1:
+            raise CommandError('--false-positive-rate must be between 0 and 1')
+        # Counted first so the filter is sized without holding the list in memory
+        with open(options['input'], 'rb') as file:
+            capacity = sum(1 for line in file if line.rstrip(b'\r\n'))
+        if not capacity:
+            raise CommandError(f'{options["input"]} has no entries')
+        count = build_bloom_filter(
+            options['output'],
+            self.read_digests(options['input'], options['format']),
+            capacity, options['false_positive_rate']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {count} entries to {options["output"]}'
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from main.tasks import purge_expired_otps
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete OTPs expired for longer than OTP_PURGE_AFTER in batches, '
+        'for one-off cleanups of a backlog'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Rows deleted per statement, defaults to OTP_PURGE_BATCH_SIZE'
+        )
+
+    def handle(self, *args, **options):
+        # Runs in this process rather than on a worker
+        deleted = purge_expired_otps(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired OTPs'))
@@ -1,42 +1,67 @@
-from random import randint
-
 from django.conf import settings
+from django.db import IntegrityError
 from django.db.models import Manager, QuerySet
-from django.db.models.functions import Now
+from django.db.transaction import atomic
 from django.utils import timezone
 
+from main.exceptions import OTPAlreadyExistsException
+from main.otp_backends import generate_otp_value, get_otp_backend
 from main.querysets import OTPQuerySet
 
+# Inserts tried before giving up on finding an OTP value the user does not have
+OTP_CREATE_ATTEMPTS = 5
+
 
 class OTPManager(Manager):
     def get_queryset(self):
         return OTPQuerySet(self.model, using=self._db)
 
     def create_otp_for_user(self, user, otp_type: int):
-        existing_otps = self.filter(user=user, validity__gt=Now())
-        existing_otp_values = existing_otps.values_list("otp", flat=True)
-        new_otp_value = randint(100000, 999999)
-        # Keeps iterating until a new OTP value that is not currently existing in DB is got
-        while new_otp_value in existing_otp_values:
-            new_otp_value = randint(100000, 999999)
+        """
+        Creates an OTP with a random value, unique per user and OTP type.
+
+        Uniqueness is enforced by the otp_user_type_otp_unique constraint,
+        so a colliding value costs a failed insert and a retry instead of
+        reading the user's existing OTPs first.
+
+        Raises:
+            OTPAlreadyExistsException: If OTP_CREATE_ATTEMPTS inserts collided.
+        """
         created_at = timezone.now()
         attempt = self.get_last_attempt_number(user, otp_type) + 1
-        otp = self.create(
-            user=user, otp=new_otp_value,
-            otp_type=otp_type,
-            created_at=created_at,
-            attempt=attempt,
-            validity=created_at + settings.OTP_EXPIRY
-        )
-        return otp
+        for _ in range(OTP_CREATE_ATTEMPTS):
+            try:
+                # Savepoint so a collision does not break an outer transaction
+                with atomic():
+                    return self.create(
+                        user=user, otp=generate_otp_value(),
+                        otp_type=otp_type,
+                        created_at=created_at,
+                        attempt=attempt,
+                        validity=created_at + settings.OTP_EXPIRY
+                    )
+            except IntegrityError:
+                continue
+        raise OTPAlreadyExistsException()
 
     def filter_valid_otps(self, **kwargs) -> QuerySet:
         return self.get_queryset().filter_valid_otps(**kwargs)
 
+    # OTPs are issued, verified and invalidated through the backend set by
+    # OTP_BACKEND, see main.otp_backends. Only the database backend uses
+    # the OTP table.
+
+    def issue_otp(self, user, otp_type: int) -> str:
+        return get_otp_backend().issue(user, otp_type)
+
+    def verify_otp(self, user, otp_type: int, otp: str) -> str | None:
+        return get_otp_backend().verify(user, otp_type, otp)
+
+    def get_user_with_otp(self, username: str, otp_type: int, otp: str) -> tuple:
+        return get_otp_backend().get_user_with_otp(username, otp_type, otp)
+
+    def consume_otp(self, user, otp_type: int, otp: str) -> bool:
+        return get_otp_backend().consume(user, otp_type, otp)
+
     def get_last_attempt_number(self, user, otp_type: int) -> int:
-        attempt = self.filter_valid_otps(
-            user=user, otp_type=otp_type
-        ).order_by("attempt").values_list("attempt", flat=True).last()
-        if attempt:
-            return attempt
-        return 0
+        return get_otp_backend().get_last_attempt_number(user, otp_type)
@@ -4,9 +4,10 @@ from django.db.models.functions import Now
 from django.utils.timezone import now
 
 from main.choices import OTPTypeChoices
-from main.exceptions import OTPAlreadyExistsException
 from main.managers import OTPManager
 from root.utils.models import MetaModel
+from root.utils.password_hashing import (acheck_password_hash, ahash_password,
+                                         check_password_hash, hash_password)
 
 # Create your models here.
 
@@ -16,6 +17,30 @@ class User(AbstractUser):
 
     def __str__(self) -> str: return self.username
 
+    # Hashing runs in root.utils.password_hashing's bounded pool, which
+    # raises PasswordHashingBusy (503) when it is saturated
+
+    def set_password(self, raw_password: str | None):
+        self.password = hash_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password: str) -> bool:
+        is_correct, must_update = check_password_hash(raw_password, self.password)
+        if is_correct and must_update:
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=["password"])
+        return is_correct
+
+    async def acheck_password(self, raw_password: str) -> bool:
+        is_correct, must_update = await acheck_password_hash(
+            raw_password, self.password
+        )
+        if is_correct and must_update:
+            self.password = await ahash_password(raw_password)
+            await self.asave(update_fields=["password"])
+        return is_correct
+
 
 class AppSettings(MetaModel):
     icon = models.ImageField(upload_to="app/icons/", null=True, blank=True)
@@ -62,6 +87,20 @@ class OTP(models.Model):
     class Meta:
         db_table = "otp"
         verbose_name = "OTP"
+        constraints = [
+            # Also the covering index of OTP verification lookups. Expired
+            # OTPs cannot be excluded with a partial index as its condition
+            # can not use now(), they are removed by the OTP cleanup instead.
+            models.UniqueConstraint(
+                fields=["user", "otp_type", "otp"],
+                include=["validity"],
+                name="otp_user_type_otp_unique"
+            )
+        ]
+        indexes = [
+            # Used by main.tasks.purge_expired_otps
+            models.Index(fields=["validity"], name="otp_validity_idx")
+        ]
 
     @property
     def is_valid(self) -> bool:
@@ -69,9 +108,3 @@ class OTP(models.Model):
 
     def __str__(self) -> str:
         return self.user.first_name
-
-    def save(self, *args, **kwargs):
-        existing_otp = OTP.objects.filter_valid_otps(otp=self.otp)
-        if existing_otp.exists():
-            raise OTPAlreadyExistsException()
-        return super().save(*args, **kwargs)
@@ -0,0 +1,215 @@
+from datetime import timedelta
+from functools import lru_cache
+from secrets import randbelow
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Now
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from django.utils.module_loading import import_string
+
+from main.error_codes import EXPIRED_OTP, INVALID_OTP
+from root.utils.constants.cache_keys import (OTP_ATTEMPT_CACHE_KEY,
+                                             OTP_CODE_CACHE_KEY,
+                                             OTP_GENERATION_CACHE_KEY)
+
+
+def generate_otp_value() -> str:
+    return str(100000 + randbelow(900000))
+
+
+class BaseOTPBackend:
+    """
+    Stores OTPs sent to users, see main.managers.OTPManager.
+
+    An OTP is valid for OTP_EXPIRY. Every OTP issued while an earlier one
+    of the same user and type is still valid counts as one more attempt,
+    and using an OTP invalidates every OTP of that user and type.
+    """
+
+    def issue(self, user, otp_type: int) -> str:
+        """Creates an OTP and returns its value."""
+        raise NotImplementedError
+
+    def verify(self, user, otp_type: int, otp: str) -> str | None:
+        """Returns None if the OTP is valid, else INVALID_OTP or EXPIRED_OTP."""
+        raise NotImplementedError
+
+    def get_user_with_otp(self, username: str, otp_type: int, otp: str) -> tuple:
+        """
+        Returns the user with the username, None if there is none, and the
+        result of verify for the OTP.
+        """
+        user = get_user_model().objects.filter(username=username).first()
+        if user is None:
+            return None, None
+        return user, self.verify(user, otp_type, otp)
+
+    def consume(self, user, otp_type: int, otp: str) -> bool:
+        """
+        Invalidates every OTP of the user and type.
+
+        Returns whether otp was valid at that moment, so of concurrent
+        requests using the same OTP only one gets True.
+        """
+        raise NotImplementedError
+
+    def get_last_attempt_number(self, user, otp_type: int) -> int:
+        raise NotImplementedError
+
+
+class DatabaseOTPBackend(BaseOTPBackend):
+    """Keeps OTPs as rows of main.models.OTP."""
+
+    @property
+    def model(self):
+        from main.models import OTP
+        return OTP
+
+    def issue(self, user, otp_type: int) -> str:
+        return self.model.objects.create_otp_for_user(user, otp_type).otp
+
+    def verify(self, user, otp_type: int, otp: str) -> str | None:
+        otps = self.model.objects.filter(user=user, otp_type=otp_type, otp=otp)
+        if not otps.exists():
+            return INVALID_OTP
+        if not otps.filter_valid_otps().exists():
+            return EXPIRED_OTP
+        return None
+
+    def get_user_with_otp(self, username: str, otp_type: int, otp: str) -> tuple:
+        # The user, whether the OTP exists and whether it is valid in one query
+        otps = self.model.objects.filter(
+            user=OuterRef("pk"), otp_type=otp_type, otp=otp
+        )
+        user = get_user_model().objects.annotate(
+            otp_exists=Exists(otps),
+            otp_valid=Exists(otps.filter(validity__gt=Now()))
+        ).filter(username=username).first()
+        if user is None:
+            return None, None
+        if not user.otp_exists:
+            return user, INVALID_OTP
+        if not user.otp_valid:
+            return user, EXPIRED_OTP
+        return user, None
+
+    def consume(self, user, otp_type: int, otp: str) -> bool:
+        # A single DELETE ... RETURNING, QuerySet.delete() would select the
+        # rows first since OTP deletes have signal receivers
+        opts = self.model._meta
+        quote_name = connection.ops.quote_name
+        user_id, otp_type_, otp_, validity = (
+            quote_name(opts.get_field(name).column)
+            for name in ("user", "otp_type", "otp", "validity")
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {quote_name(opts.db_table)} "
+                f"WHERE {user_id} = %s AND {otp_type_} = %s "
+                f"RETURNING {otp_} = %s AND {validity} > %s",
+                [
+                    user.pk, otp_type, otp,
+                    connection.ops.adapt_datetimefield_value(timezone.now())
+                ]
+            )
+            return any(row[0] for row in cursor.fetchall())
+
+    def get_last_attempt_number(self, user, otp_type: int) -> int:
+        attempt = self.model.objects.filter_valid_otps(
+            user=user, otp_type=otp_type
+        ).order_by("attempt").values_list("attempt", flat=True).last()
+        if attempt:
+            return attempt
+        return 0
+
+
+class CacheOTPBackend(BaseOTPBackend):
+    """
+    Keeps OTPs in the cache (Redis) with native expiry, nothing is written to the database.
+
+    Each OTP is stored as an HMAC of its value under its own key, holding
+    the time it is valid until. It is kept EXPIRED_OTP_RETENTION longer so
+    a recently expired OTP is still reported as expired rather than
+    invalid. The attempt counter expires OTP_EXPIRY after the last OTP was
+    issued, like the last valid OTP row of the database backend. Using
+    OTPs bumps the user's generation, which every OTP key embeds, so the
+    OTPs issued before become unreachable and are left to expire.
+    """
+    EXPIRED_OTP_RETENTION = timedelta(hours=1)
+
+    def get_code_key(self, user, otp_type: int, otp: str) -> str:
+        generation = cache.get(
+            OTP_GENERATION_CACHE_KEY.format(user_id=user.pk, otp_type=otp_type), 0
+        )
+        otp_hash = salted_hmac(
+            "main.otp_backends.CacheOTPBackend", f"{user.pk}:{otp_type}:{otp}"
+        ).hexdigest()
+        return OTP_CODE_CACHE_KEY.format(
+            user_id=user.pk, otp_type=otp_type,
+            generation=generation, otp_hash=otp_hash
+        )
+
+    def incr(self, key: str, timeout: float) -> int:
+        cache.add(key, 0, timeout=timeout)
+        value = cache.incr(key)
+        cache.touch(key, timeout=timeout)
+        return value
+
+    def issue(self, user, otp_type: int) -> str:
+        expiry = settings.OTP_EXPIRY.total_seconds()
+        self.incr(
+            OTP_ATTEMPT_CACHE_KEY.format(user_id=user.pk, otp_type=otp_type),
+            expiry
+        )
+        otp = generate_otp_value()
+        valid_until = timezone.now() + settings.OTP_EXPIRY
+        cache.set(
+            self.get_code_key(user, otp_type, otp), valid_until.timestamp(),
+            timeout=expiry + self.EXPIRED_OTP_RETENTION.total_seconds()
+        )
+        return otp
+
+    def verify(self, user, otp_type: int, otp: str) -> str | None:
+        valid_until = cache.get(self.get_code_key(user, otp_type, otp))
+        if valid_until is None:
+            return INVALID_OTP
+        if valid_until <= timezone.now().timestamp():
+            return EXPIRED_OTP
+        return None
+
+    def consume(self, user, otp_type: int, otp: str) -> bool:
+        code_key = self.get_code_key(user, otp_type, otp)
+        valid_until = cache.get(code_key)
+        # Only one of concurrent requests deletes the key
+        consumed = (
+            valid_until is not None and
+            valid_until > timezone.now().timestamp() and
+            cache.delete(code_key)
+        )
+        # Outlives every OTP key of the generation it ends
+        self.incr(
+            OTP_GENERATION_CACHE_KEY.format(user_id=user.pk, otp_type=otp_type),
+            (settings.OTP_EXPIRY + self.EXPIRED_OTP_RETENTION).total_seconds()
+        )
+        cache.delete(OTP_ATTEMPT_CACHE_KEY.format(user_id=user.pk, otp_type=otp_type))
+        return bool(consumed)
+
+    def get_last_attempt_number(self, user, otp_type: int) -> int:
+        return cache.get(
+            OTP_ATTEMPT_CACHE_KEY.format(user_id=user.pk, otp_type=otp_type), 0
+        )
+
+
+@lru_cache
+def load_otp_backend(path: str) -> BaseOTPBackend:
+    return import_string(path)()
+
+
+def get_otp_backend() -> BaseOTPBackend:
+    """Returns the backend configured by OTP_BACKEND."""
+    return load_otp_backend(settings.OTP_BACKEND)
@@ -1,5 +1,5 @@
 from django.contrib.auth import authenticate, get_user_model
-from django.db.models.functions import Now
+from django.db.transaction import atomic
 from rest_framework import serializers
 from rest_framework.authtoken.serializers import AuthTokenSerializer
 from rest_framework.exceptions import AuthenticationFailed
@@ -13,6 +13,11 @@ from .validators import is_email_format, user_exists, validate_password
 
 User = get_user_model()
 
+OTP_ERROR_MESSAGES = {
+    INVALID_OTP: "Invalid OTP",
+    EXPIRED_OTP: "OTP has expired"
+}
+
 
 class SignupAPISerializer(serializers.ModelSerializer):
     class Meta:
@@ -152,93 +157,100 @@ class ForgotPasswordSerializer(serializers.Serializer):
         value = value.lower()
         if not is_email_format(value):
             raise serializers.ValidationError('Invalid email format')
-        if not user_exists(username=value):
-            raise serializers.ValidationError('User does not exist')
         return value
 
+    def validate(self, attrs):
+        # Looked up once here, the view reads it from validated_data
+        user = User.objects.filter(username=attrs['email'], is_active=True).first()
+        if user is None:
+            raise serializers.ValidationError({'email': ['User does not exist']})
+        attrs['user'] = user
+        return attrs
 
-class ResetPasswordSerializer(serializers.Serializer):
-    email = serializers.SlugRelatedField(
-        slug_field='username',
-        queryset=User.objects.all()
-    )
-    otp = serializers.CharField()
-    new_password = serializers.CharField(write_only=True, min_length=8)
 
-    def validate_new_password(self, value: str) -> str:
-        validation_errors = validate_password(value)
-        if not validation_errors:
-            return value
-        raise serializers.ValidationError(validation_errors)
+class OTPVerificationSerializer(serializers.Serializer):
+    """
+    Base of serializers using an OTP of otp_type sent to email.
+
+    The user and the OTP's status are read in a single query and the user
+    is added to validated_data as user.
+    """
+    email = serializers.CharField()
+    otp = serializers.CharField()
+    otp_type: int
 
     def validate(self, attrs):
-        otp = OTP.objects.filter(
-            user__username=attrs["email"].username,
-            otp=attrs["otp"]
+        user, error_code = OTP.objects.get_user_with_otp(
+            attrs["email"], self.otp_type, attrs["otp"]
         )
-        if not otp.exists():
+        if user is None:
+            message = serializers.SlugRelatedField.default_error_messages[
+                "does_not_exist"
+            ].format(slug_name="username", value=attrs["email"])
             raise serializers.ValidationError(
-                {"otp": ["Invalid OTP"]},
-                code=INVALID_OTP
+                {"email": [message]}, code="does_not_exist"
             )
-        otp = otp.filter(
-            validity__gt=Now()
-        )
-        if not otp.exists():
+        if error_code:
             raise serializers.ValidationError(
-                {"otp": ["OTP has expired"]},
-                code=EXPIRED_OTP
+                {"otp": [OTP_ERROR_MESSAGES[error_code]]},
+                code=error_code
             )
+        attrs["user"] = user
         return attrs
 
+    def consume_otp(self) -> None:
+        """
+        Invalidates the user's OTPs of otp_type.
+
+        Raises:
+            serializers.ValidationError: If a concurrent request used the OTP first.
+        """
+        if not OTP.objects.consume_otp(
+            self.validated_data["user"], self.otp_type, self.validated_data["otp"]
+        ):
+            raise serializers.ValidationError(
+                {"otp": [OTP_ERROR_MESSAGES[INVALID_OTP]]},
+                code=INVALID_OTP
+            )
+
+
+class ResetPasswordSerializer(OTPVerificationSerializer):
+    new_password = serializers.CharField(write_only=True, min_length=8)
+    otp_type = OTPTypeChoices.FORGOT_PASSWORD.value
+
+    def validate_new_password(self, value: str) -> str:
+        validation_errors = validate_password(value)
+        if not validation_errors:
+            return value
+        raise serializers.ValidationError(validation_errors)
+
     def save(self, **kwargs):
-        user = self.validated_data["email"]
+        user = self.validated_data["user"]
+        # Hashed before the transaction to keep it short
         user.set_password(self.validated_data["new_password"])
-        user.save()
-        OTP.objects.filter(
-            user=user, otp_type=OTPTypeChoices.FORGOT_PASSWORD.value
-        ).delete()
+        with atomic():
+            self.consume_otp()
+            user.save(update_fields=["password"])
 
 
-class EmailVerificationSerializer(serializers.Serializer):
-    email = serializers.SlugRelatedField(
-        slug_field='username',
-        queryset=User.objects.all()
-    )
-    otp = serializers.CharField()
+class EmailVerificationSerializer(OTPVerificationSerializer):
+    otp_type = OTPTypeChoices.EMAIL_VERIFICATION.value
 
     def validate(self, attrs):
-        user = attrs["email"]
-        otp = OTP.objects.filter(
-            user__username=user.username,
-            otp_type=OTPTypeChoices.EMAIL_VERIFICATION.value,
-            otp=attrs["otp"]
-        )
-        if not otp.exists():
-            raise serializers.ValidationError(
-                {"otp": ["Invalid OTP"]},
-                code=INVALID_OTP
-            )
-        valid_otps = otp.filter_valid_otps()
-        if not valid_otps.exists():
-            raise serializers.ValidationError(
-                {"otp": ["OTP has expired"]},
-                code=EXPIRED_OTP
-            )
-        if user.email_verified:
+        attrs = super().validate(attrs)
+        if attrs["user"].email_verified:
             raise serializers.ValidationError(
                 {"email": ["Email already verified"]},
                 code=EMAIL_ALREADY_VERIFIED
             )
-        return super().validate(attrs)
+        return attrs
 
     def save(self, **kwargs) -> UserModel:
-        user = self.validated_data["email"]
+        user = self.validated_data["user"]
         user.email_verified = True
-        user.save()
-        OTP.objects.filter(
-            user=user, otp_type=OTPTypeChoices.EMAIL_VERIFICATION.value
-        ).delete()
+        with atomic():
+            self.consume_otp()
+            user.save(update_fields=["email_verified"])
         return user
 
 
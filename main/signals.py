@@ -1,20 +1,80 @@
 import logging
 
 from django.core.cache import cache
-from django.db.models.signals import post_save
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
 
-from main.utils import clear_meta_api_cache
+from main.utils import clear_app_settings_cache, clear_module_info_cache
+from root.utils.signed_tokens import revoke_user_signed_tokens
+from root.utils.token_cache import invalidate_token, invalidate_user_token
 from root.utils.utils import clear_cache
 
-from .models import AppSettings, ModuleInfo
+from .models import AppSettings, ModuleInfo, User
 
 
 @receiver(post_save, sender=AppSettings)
-def appsettings_post_save(sender, instance: AppSettings, created: bool, **kwargs):
-    clear_meta_api_cache()
+@receiver(post_delete, sender=AppSettings)
+def appsettings_post_save(sender, instance: AppSettings, **kwargs):
+    clear_app_settings_cache()
 
 
 @receiver(post_save, sender=ModuleInfo)
-def module_info_post_save(sender, instance: ModuleInfo, created: bool, **kwargs):
-    clear_meta_api_cache()
+@receiver(post_delete, sender=ModuleInfo)
+def module_info_post_save(sender, instance: ModuleInfo, **kwargs):
+    clear_module_info_cache()
+
+
+@receiver(post_delete, sender=Token)
+def token_post_delete(sender, instance: Token, **kwargs):
+    # Covers logout, token rotation on login and cascades from user deletion
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_post_save(sender, instance: User, created: bool, **kwargs):
+    # Deactivation, password changes and profile edits must not be served stale
+    if not created:
+        invalidate_user_token(instance.pk)
+        # _password is only set by set_password and is cleared after post_save
+        if instance._password is not None or not instance.is_active:
+            revoke_user_signed_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_post_delete(sender, instance: User, **kwargs):
+    # Signed tokens are not stored, so they are revoked rather than cascaded
+    revoke_user_signed_tokens(instance.pk)
+
+
+@receiver(post_migrate)
+def create_auth_token_created_index(sender, using: str, **kwargs):
+    # authtoken_token belongs to rest_framework, so the index on `created`
+    # used by main.tasks.purge_expired_auth_tokens is created here.
+    if sender.label != Token._meta.app_label:
+        return
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    index_name = quote_name("authtoken_token_created_idx")
+    # On PostgreSQL the index is built without locking out token writes,
+    # so logins keep working while a deploy builds it on a large table
+    concurrently = (
+        connection.vendor == "postgresql" and not connection.in_atomic_block
+    )
+    with connection.cursor() as cursor:
+        if concurrently:
+            # A failed concurrent build leaves an invalid index behind,
+            # which IF NOT EXISTS would skip
+            cursor.execute(
+                "SELECT 1 FROM pg_index WHERE NOT indisvalid "
+                "AND indexrelid = to_regclass(%s)",
+                ["authtoken_token_created_idx"]
+            )
+            if cursor.fetchone():
+                cursor.execute(f"DROP INDEX CONCURRENTLY {index_name}")
+        cursor.execute(
+            f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}"
+            f"IF NOT EXISTS {index_name} "
+            f"ON {quote_name(Token._meta.db_table)} ({quote_name('created')})"
+        )
@@ -1,48 +1,71 @@
+import logging
 from logging import error
 
 from celery import shared_task
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from django.utils import timezone
+from django_celery_results.models import TaskResult
+from django_redis import get_redis_connection
+from rest_framework.authtoken.models import Token
 
 from main.choices import OTPTypeChoices
 from main.exceptions import OTPAlreadyExistsException
-from main.models import OTP, AppSettings
+from main.models import OTP
+from main.utils import get_app_settings
+from root.utils.constants.cache_keys import (MAIL_DELIVERY_LOCK_KEY,
+                                             MAIL_OUTBOX_KEY)
+from root.utils.email_templates import render_email
+from root.utils.mail import (deliver_email_batch, queue_email,
+                             requeue_deferred_emails,
+                             restore_processing_emails)
+from root.utils.utils import delete_in_batches
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
 
-@shared_task(
-    bind=True,
-    autoretry_for=(Exception,),
-    retry_kwargs={"max_retries": 5, "countdown": 30},
-    retry_backoff=True,
-    retry_jitter=True,
-)
-def send_verification_email_task(self, user_id: int):
-    user = User.objects.get(id=user_id)
-    otp = OTP.objects.create_otp_for_user(
-        user=user,
-        otp_type=OTPTypeChoices.EMAIL_VERIFICATION.value,
-    )
-    app_settings = AppSettings.objects.last()
+
+def send_otp_email(user_id: int, otp_type: int, template_name: str, subject: str):
+    """
+    Issues an OTP of otp_type to the user and queues it in an email
+    rendered from template_name.
+    """
+    user = User.objects.filter(id=user_id).first()
+    if user is None:
+        error(f"Unable to send {template_name} email, no user found with ID {user_id}")
+        return
+    otp = OTP.objects.issue_otp(user=user, otp_type=otp_type)
+    app_settings = get_app_settings()
     app_title = app_settings.app_name if app_settings else "PayBuddy"
-    send_mail(
-        subject=f"{app_title}: Email Verification",
+    queue_email(
+        subject=f"{app_title}: {subject}",
         message="",
-        html_message=render_to_string(
-            "email/welcome.html",
+        html_message=render_email(
+            template_name,
             {
-                "user": user,
-                "otp": otp.otp,
                 "expiry": int(settings.OTP_EXPIRY.total_seconds() / 60),
                 "app_title": app_title,
             },
+            {"user.first_name": user.first_name, "otp": otp},
         ),
-        from_email=None,
         recipient_list=[user.username],
     )
+    deliver_queued_emails.delay()
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_kwargs={"max_retries": 5, "countdown": 30},
+    retry_backoff=True,
+    retry_jitter=True,
+)
+def send_verification_email_task(self, user_id: int):
+    send_otp_email(
+        user_id, OTPTypeChoices.EMAIL_VERIFICATION.value,
+        "email/welcome.html", "Email Verification"
+    )
 
 
 @shared_task(
@@ -53,30 +76,9 @@ def send_verification_email_task(self, user_id: int):
     retry_jitter=True,
 )
 def send_forgot_password_otp_email(self, user_id):
-    user = User.objects.filter(id=user_id)
-    if not user.exists():
-        error("Unable to send forgot password email, user not found")
-    user = user.first()
-    otp = OTP.objects.create_otp_for_user(
-        user=user,
-        otp_type=OTPTypeChoices.FORGOT_PASSWORD.value
-    )
-    app_settings = AppSettings.objects.last()
-    app_title = app_settings.app_name if app_settings else "PayBuddy"
-    send_mail(
-        subject=f"{app_title}: Email Verification",
-        message="",
-        html_message=render_to_string(
-            "email/reset_password.html",
-            {
-                "user": user,
-                "otp": otp.otp,
-                "expiry": int(settings.OTP_EXPIRY.total_seconds() / 60),
-                "app_title": app_title,
-            },
-        ),
-        from_email=None,
-        recipient_list=[user.username],
+    send_otp_email(
+        user_id, OTPTypeChoices.FORGOT_PASSWORD.value,
+        "email/reset_password.html", "Email Verification"
     )
 
 
@@ -88,29 +90,108 @@ def send_forgot_password_otp_email(self, user_id):
     retry_jitter=True,
 )
 def resend_verification_otp_email(self, user_id):
-    user = User.objects.filter(id=user_id)
-    if not user.exists():
-        error(
-            f"Unable to resend verification OTP email, no user found with ID {user_id}")
-    user = user.first()
-    otp = OTP.objects.create_otp_for_user(
-        user=user,
-        otp_type=OTPTypeChoices.EMAIL_VERIFICATION.value
+    send_otp_email(
+        user_id, OTPTypeChoices.EMAIL_VERIFICATION.value,
+        "email/email_verify.html", "Email Verification"
     )
-    app_settings = AppSettings.objects.last()
-    app_title = app_settings.app_name if app_settings else "PayBuddy"
-    send_mail(
-        subject=f"{app_title}: Email Verification",
-        message="",
-        html_message=render_to_string(
-            "email/email_verify.html",
-            {
-                "user": user,
-                "otp": otp.otp,
-                "expiry": int(settings.OTP_EXPIRY.total_seconds() / 60),
-                "app_title": app_title,
-            },
-        ),
-        from_email=None,
-        recipient_list=[user.username],
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, retry_kwargs={"max_retries": 3})
+def purge_expired_auth_tokens(self) -> int:
+    """
+    Deletes auth tokens older than AUTH_TOKEN_EXPIRY in bounded batches.
+
+    Expired tokens are otherwise only removed when their user logs in again.
+    """
+    logger.info("Started purging expired auth tokens")
+    expired_tokens = Token.objects.filter(
+        created__lt=timezone.now() - settings.AUTH_TOKEN_EXPIRY
+    )
+    deleted = delete_in_batches(
+        expired_tokens, settings.AUTH_TOKEN_PURGE_BATCH_SIZE,
+        order_field="created"
     )
+    logger.info(f"Purged {deleted} expired auth tokens")
+    return deleted
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, retry_kwargs={"max_retries": 3})
+def purge_expired_otps(self, batch_size: int | None = None) -> int:
+    """
+    Deletes OTPs expired for longer than OTP_PURGE_AFTER in bounded batches.
+
+    OTPs are otherwise only removed when they are used, so abandoned flows
+    leave their rows behind. Recently expired OTPs are kept so they are
+    still reported as expired rather than invalid.
+    """
+    logger.info("Started purging expired OTPs")
+    expired_otps = OTP.objects.filter(
+        validity__lt=timezone.now() - settings.OTP_PURGE_AFTER
+    )
+    deleted = delete_in_batches(
+        expired_otps, batch_size or settings.OTP_PURGE_BATCH_SIZE,
+        order_field="validity"
+    )
+    logger.info(f"Purged {deleted} expired OTPs")
+    return deleted
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, retry_kwargs={"max_retries": 3})
+def purge_task_results(self, batch_size: int | None = None) -> int:
+    """
+    Deletes task results stored in the database that are older than
+    TASK_RESULT_RETENTION, in bounded batches.
+
+    Results now go to CELERY_RESULT_BACKEND with an expiry, this prunes
+    the rows written while it was django-db and any written since by
+    tasks configured with backend="django-db".
+    """
+    logger.info("Started purging task results")
+    old_results = TaskResult.objects.filter(
+        date_done__lt=timezone.now() - settings.TASK_RESULT_RETENTION
+    )
+    deleted = delete_in_batches(
+        old_results, batch_size or settings.TASK_RESULT_PURGE_BATCH_SIZE,
+        order_field="date_done"
+    )
+    logger.info(f"Purged {deleted} task results")
+    return deleted
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, retry_kwargs={"max_retries": 5})
+def deliver_queued_emails(self, requeue_deferred: bool = False) -> int:
+    """
+    Sends the emails queued by root.utils.mail.queue_email in batches of
+    EMAIL_BATCH_SIZE, each message on its own over the worker process's
+    pooled connection.
+
+    One delivery runs at a time. It first restores the emails an
+    interrupted run left in processing and, when run by beat with
+    requeue_deferred, the deferred emails due for a retry. It stops after
+    EMAIL_MAX_BATCHES batches, emails left in the outbox are handed to the
+    next run.
+
+    Returns:
+        int: Number of emails taken from the outbox.
+    """
+    redis = get_redis_connection("default")
+    lock = redis.lock(MAIL_DELIVERY_LOCK_KEY, timeout=settings.CELERY_TASK_TIME_LIMIT)
+    if not lock.acquire(blocking=False):
+        logger.info("Skipped email delivery, another delivery is running")
+        return 0
+    try:
+        restore_processing_emails()
+        if requeue_deferred:
+            requeue_deferred_emails()
+        sent = 0
+        for _ in range(settings.EMAIL_MAX_BATCHES):
+            if not (batch := deliver_email_batch(settings.EMAIL_BATCH_SIZE)):
+                break
+            sent += batch
+    finally:
+        lock.release()
+    logger.info("Processed %d queued emails", sent)
+    # Emails queued while the lock was held, or left over by the batch limit
+    if redis.llen(MAIL_OUTBOX_KEY):
+        deliver_queued_emails.delay()
+    return sent
@@ -1,10 +1,61 @@
+import json
+from contextlib import contextmanager
+from datetime import timedelta
+from hashlib import sha1
+from io import StringIO
+from socket import SHUT_RDWR, socket
+from tempfile import TemporaryDirectory
+from threading import Event
+from time import time
+from unittest.mock import patch
+
+from aiosmtpd.controller import Controller
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
 from django.core.management import call_command
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from django_celery_results.models import TaskResult
+from django_redis import get_redis_connection
 from pytest import fixture
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
 from rest_framework.test import APITestCase
 
+from main.choices import AuthTokenTypeChoices, OTPTypeChoices
+from main.error_codes import (EXPIRED_OTP, INVALID_OTP,
+                              MAXIMUM_NUMBER_OF_ATTEMPTS_EXCEEDED)
+from main.exceptions import OTPAlreadyExistsException
+from main.models import OTP, ModuleInfo
+from main.tasks import (deliver_queued_emails, purge_expired_auth_tokens,
+                        purge_expired_otps, purge_task_results,
+                        send_forgot_password_otp_email)
+from main.utils import check_otp_rate_limit, get_module_infos
+from main.validators import get_password_validators, validate_password
+from root.utils.constants.cache_keys import (API_CACHE_KEY, API_CACHE_LOCK_KEY,
+                                             KEYS, MAIL_DEAD_LETTER_KEY,
+                                             MAIL_DEFERRED_KEY,
+                                             MAIL_DELIVERY_LOCK_KEY,
+                                             MAIL_OUTBOX_KEY,
+                                             MAIL_PROCESSING_KEY,
+                                             MODULE_INFO_NAMESPACE)
+from root.utils.email_templates import (email_template_counter,
+                                        prerendered_templates, render_email)
+from root.utils.error_codes import PASSWORD_HASHING_BUSY
+from root.utils.mail import mail_connection, queue_email
+from root.utils.password_hashing import PasswordHashingBusy, PasswordHashingPool
+from root.utils.password_validations import BreachedPasswordValidator
+from root.utils.tiered_cache import (local_cache, local_cache_counter,
+                                     shared_cache_counter)
+from root.utils.token_cache import token_cache_counter
+from root.utils.utils import (bump_cache_namespace_version,
+                              get_cache_namespace_version)
+
 User = get_user_model()
 
 # Create your tests here.
@@ -16,6 +67,9 @@ DEFAULT_USERNAME = "tester@payfirst.com"
 
 @fixture(autouse=True)
 def load_fixture(django_db_blocker):
+    # Cached responses and tokens must not leak between tests
+    cache.clear()
+    local_cache.clear()
     with django_db_blocker.unblock():
         call_command(
             "loaddata", "main/fixtures/user.json",
@@ -610,6 +664,50 @@ class ProfileAPITestCase(APITestCase, BasicTestsMixin):
         ), "Expected status code 401 for unauthorized access"
         assert "error" in response.data, "Expected 'error' field in error response"
 
+
+class ConditionalGetTestCase(APITestCase, BasicTestsMixin):
+    """
+    ETag / If-None-Match test cases
+    """
+    def setUp(self):
+        self.token = self.create_user_token()
+        self.headers = {"HTTP_AUTHORIZATION": f"Token {self.token.key}"}
+        return super().setUp()
+
+    def test_profile_not_modified(self):
+        """
+        Tests that a matching If-None-Match returns 304 without a body.
+        """
+        response = self.client.get("/profile", **self.headers)
+        assert response.status_code == 200, "Expected api status code be 200"
+        etag = response["ETag"]
+        assert etag.startswith('"'), "Expected a strong ETag"
+        response = self.client.get(
+            "/profile", HTTP_IF_NONE_MATCH=etag, **self.headers
+        )
+        assert response.status_code == 304, "Expected api status code be 304"
+        assert response.content == b"", "Expected an empty body"
+
+    def test_profile_modified(self):
+        """
+        Tests that a stale ETag returns the full response.
+        """
+        response = self.client.get(
+            "/profile", HTTP_IF_NONE_MATCH='"stale"', **self.headers
+        )
+        assert response.status_code == 200, "Expected api status code be 200"
+
+    def test_meta_not_modified_from_cache(self):
+        """
+        Tests that the meta API answers If-None-Match from the cached ETag without queries.
+        """
+        response = self.client.get("/meta")
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get("/meta", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, "Expected api status code be 304"
+
+
 class MetaAPITestCase(APITestCase, BasicTestsMixin):
     """
     Meta API Test case
@@ -633,4 +731,999 @@ class MetaAPITestCase(APITestCase, BasicTestsMixin):
         response = self.client.get(self.BASE_URL)
         assert response.status_code == 200, "Expected api status code be 200"
         modules = response.data.get("modules")
-        assert len(modules) == 6, "Expected 6 active modules in response"
\ No newline at end of file
+        assert len(modules) == 6, "Expected 6 active modules in response"
+
+    def test_meta_api_cache_invalidation(self):
+        """
+        Tests that saving a module invalidates the cached meta API response.
+        """
+        response = self.client.get(self.BASE_URL)
+        assert response.status_code == 200, "Expected api status code be 200"
+        module = ModuleInfo.objects.get(pk=1)
+        module.name = "Renamed module"
+        module.save()
+        response = self.client.get(self.BASE_URL)
+        assert response.status_code == 200, "Expected api status code be 200"
+        modules = {
+            module["id"]: module for module in response.json()["data"]["modules"]
+        }
+        assert (
+            modules[1]["name"] == "Renamed module"
+        ), "Expected the updated module in response"
+
+    def get_lock_key(self):
+        namespace = KEYS[self.BASE_URL]
+        return API_CACHE_LOCK_KEY.format(cache_key=API_CACHE_KEY.format(
+            namespace=namespace,
+            version=get_cache_namespace_version(namespace),
+            token="0"
+        ))
+
+    def test_meta_api_stale_while_rebuilding(self):
+        """
+        Tests that an invalidated response is served stale while another request rebuilds it.
+        """
+        self.client.get(self.BASE_URL)
+        module = ModuleInfo.objects.get(pk=1)
+        module.name = "Renamed module"
+        module.save()
+        # Another request is rebuilding the response
+        cache.add(self.get_lock_key(), 1)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.BASE_URL)
+        assert response.status_code == 200, "Expected api status code be 200"
+        modules = {
+            module["id"]: module for module in response.json()["data"]["modules"]
+        }
+        assert (
+            modules[1]["name"] != "Renamed module"
+        ), "Expected the stale response"
+
+        cache.delete(self.get_lock_key())
+        response = self.client.get(self.BASE_URL)
+        modules = {
+            module["id"]: module for module in response.json()["data"]["modules"]
+        }
+        assert (
+            modules[1]["name"] == "Renamed module"
+        ), "Expected the rebuilt response"
+        assert cache.get(self.get_lock_key()) is None, "Expected the lock released"
+
+    def test_meta_api_tiered_cache(self):
+        """
+        Tests that app settings and modules are read from the process local
+        cache, then the shared cache, and reloaded after an invalidation.
+        """
+        local_cache_counter.reset()
+        shared_cache_counter.reset()
+        assert len(get_module_infos()) == 6, "Expected 6 modules"
+        assert shared_cache_counter.misses == 1, "Expected a shared cache miss"
+        with self.assertNumQueries(0):
+            get_module_infos()
+        assert local_cache_counter.hits == 1, "Expected a local cache hit"
+
+        local_cache.clear()
+        with self.assertNumQueries(0):
+            get_module_infos()
+        assert shared_cache_counter.hits == 1, "Expected a shared cache hit"
+
+        module = ModuleInfo.objects.get(pk=1)
+        module.name = "Renamed module"
+        module.save()
+        modules = {module.id: module for module in get_module_infos()}
+        assert (
+            modules[1].name == "Renamed module"
+        ), "Expected the updated module"
+
+    @override_settings(TIERED_CACHE_LOCAL_TIMEOUT=0)
+    def test_tiered_cache_invalidated_by_other_process(self):
+        """
+        Tests that an expired local entry is dropped once another process bumps the version.
+        """
+        get_module_infos()
+        # Another process invalidates the shared cache only
+        bump_cache_namespace_version(MODULE_INFO_NAMESPACE)
+        local_cache_counter.reset()
+        with self.assertNumQueries(1):
+            get_module_infos()
+        assert local_cache_counter.misses == 1, "Expected a local cache miss"
+
+    @override_settings(API_CACHE_LOCK_WAIT=0)
+    def test_meta_api_rebuilds_without_stale_copy(self):
+        """
+        Tests that a request rebuilds the response itself if the lock is held and nothing is cached.
+        """
+        cache.add(self.get_lock_key(), 1)
+        response = self.client.get(self.BASE_URL)
+        assert response.status_code == 200, "Expected api status code be 200"
+        assert cache.get(self.get_lock_key()) == 1, "Expected the other request's lock kept"
+
+
+class TokenCacheTestCase(APITestCase, BasicTestsMixin):
+    """
+    Cached token authentication test cases
+    """
+    def setUp(self):
+        self.token = self.create_user_token()
+        self.headers = {"HTTP_AUTHORIZATION": f"Token {self.token.key}"}
+        token_cache_counter.reset()
+        return super().setUp()
+
+    def test_cached_token_skips_database(self):
+        """
+        Tests that a second authenticated request is served without any database query.
+        """
+        response = self.client.get("/profile", **self.headers)
+        assert response.status_code == 200, "Expected api status code be 200"
+        with self.assertNumQueries(0):
+            response = self.client.get("/profile", **self.headers)
+        assert response.status_code == 200, "Expected api status code be 200"
+        assert (
+            response.data.get("username") == self.token.user.username
+        ), "Expected cached user to be returned"
+        assert token_cache_counter.hits == 1, "Expected one token cache hit"
+        assert token_cache_counter.misses == 1, "Expected one token cache miss"
+
+    def test_logout_invalidates_cached_token(self):
+        """
+        Tests that a token removed by logout is not accepted from the cache.
+        """
+        self.client.get("/profile", **self.headers)
+        response = self.client.delete("/logout", **self.headers)
+        assert response.status_code == 204, "Expected status code 204 for logout"
+        response = self.client.get("/profile", **self.headers)
+        assert (
+            response.status_code == 401
+        ), "Expected status code 401 after logout"
+
+    def test_user_deactivation_invalidates_cached_token(self):
+        """
+        Tests that deactivating a user drops the cached user data.
+        """
+        self.client.get("/profile", **self.headers)
+        user = User.objects.get(id=self.token.user_id)
+        user.is_active = False
+        user.save()
+        response = self.client.get("/profile", **self.headers)
+        assert (
+            response.status_code == 401
+        ), "Expected status code 401 for a deactivated user"
+
+    def test_change_password_with_cached_user(self):
+        """
+        Tests that changing the password of a user loaded from the cache keeps the other fields.
+        """
+        self.client.get("/profile", **self.headers)
+        payload = {
+            "password": DEFAULT_PASSWORD,
+            "new_password": "NewPassword*1",
+        }
+        response = self.client.post("/change_password", payload, **self.headers)
+        assert (
+            response.status_code == 204
+        ), "Expected status code 204 for successful password change"
+        user = User.objects.get(id=self.token.user_id)
+        assert user.check_password("NewPassword*1"), "Expected new password to be set"
+        assert user.email_verified, "Expected other user fields to be untouched"
+
+
+@override_settings(AUTH_TOKEN_TYPE=AuthTokenTypeChoices.SIGNED)
+class SignedTokenTestCase(APITestCase, BasicTestsMixin):
+    """
+    Signed access token test cases
+    """
+    def setUp(self):
+        self.user = self.create_user(email_verified=True)
+        return super().setUp()
+
+    def login(self, password: str = DEFAULT_PASSWORD) -> dict:
+        payload = {
+            "username": self.user.username,
+            "password": password,
+        }
+        response = self.client.post("/login", payload)
+        assert (
+            response.status_code == 200
+        ), "Expected status code 200 for successful login"
+        assert (
+            response.data.get("token_type") == "Bearer"
+        ), "Expected a Bearer token to be issued"
+        return {"HTTP_AUTHORIZATION": f"Bearer {response.data['token']}"}
+
+    def test_signed_token_authentication(self):
+        """
+        Tests that a signed token authenticates without a database query,
+        leaving only the profile fields to be loaded.
+        """
+        headers = self.login()
+        assert not Token.objects.filter(
+            user=self.user
+        ).exists(), "Expected no database token to be created"
+        with self.assertNumQueries(1):
+            response = self.client.get("/profile", **headers)
+        assert response.status_code == 200, "Expected api status code be 200"
+        assert (
+            response.data.get("username") == self.user.username
+        ), "Expected the token user to be returned"
+
+    def test_tampered_signed_token(self):
+        """
+        Tests that a token with an altered payload is rejected.
+        """
+        headers = self.login()
+        headers["HTTP_AUTHORIZATION"] = headers["HTTP_AUTHORIZATION"][:-2] + "xx"
+        response = self.client.get("/profile", **headers)
+        assert (
+            response.status_code == 401
+        ), "Expected status code 401 for a tampered token"
+
+    def test_logout_revokes_signed_token(self):
+        """
+        Tests that a signed token is rejected after logout.
+        """
+        headers = self.login()
+        response = self.client.delete("/logout", **headers)
+        assert response.status_code == 204, "Expected status code 204 for logout"
+        response = self.client.get("/profile", **headers)
+        assert (
+            response.status_code == 401
+        ), "Expected status code 401 for a revoked token"
+
+    def test_change_password_revokes_signed_token(self):
+        """
+        Tests that every signed token of the user is rejected after a password change.
+        """
+        headers = self.login()
+        other_headers = self.login()
+        payload = {
+            "password": DEFAULT_PASSWORD,
+            "new_password": "NewPassword*1",
+        }
+        response = self.client.post("/change_password", payload, **headers)
+        assert (
+            response.status_code == 204
+        ), "Expected status code 204 for successful password change"
+        response = self.client.get("/profile", **headers)
+        assert (
+            response.status_code == 401
+        ), "Expected status code 401 for a revoked token"
+        response = self.client.get("/profile", **other_headers)
+        assert (
+            response.status_code == 401
+        ), "Expected status code 401 for the other revoked token"
+        headers = self.login(password="NewPassword*1")
+        response = self.client.get("/profile", **headers)
+        assert (
+            response.status_code == 200
+        ), "Expected a token issued after the change to be accepted"
+
+    def test_deactivation_revokes_signed_tokens(self):
+        """
+        Tests that signed tokens are rejected once the user is deactivated.
+        """
+        headers = self.login()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get("/profile", **headers)
+        assert (
+            response.status_code == 401
+        ), "Expected status code 401 for a deactivated user"
+
+    def test_user_deletion_revokes_signed_tokens(self):
+        """
+        Tests that signed tokens are rejected once the user is deleted.
+        """
+        headers = self.login()
+        self.user.delete()
+        for path in ("/profile", "/user/contact/"):
+            response = self.client.get(path, **headers)
+            assert (
+                response.status_code == 401
+            ), f"Expected status code 401 for {path} of a deleted user"
+
+
+class PurgeExpiredAuthTokensTestCase(APITestCase, BasicTestsMixin):
+    """
+    Expired auth token purge task test cases
+    """
+    def setUp(self):
+        self.expired_tokens = [
+            self.create_user_token(
+                user=self.create_user(username=f"expired{index}@payfirst.com")
+            )
+            for index in range(3)
+        ]
+        Token.objects.filter(
+            key__in=[token.key for token in self.expired_tokens]
+        ).update(created=now() - settings.AUTH_TOKEN_EXPIRY - timedelta(seconds=1))
+        self.token = self.create_user_token()
+        return super().setUp()
+
+    @override_settings(AUTH_TOKEN_PURGE_BATCH_SIZE=2)
+    def test_purge_expired_auth_tokens(self):
+        """
+        Tests that only expired tokens are deleted, across several batches.
+        """
+        deleted = purge_expired_auth_tokens()
+        assert deleted == 3, "Expected the 3 expired tokens to be deleted"
+        assert list(
+            Token.objects.values_list("key", flat=True)
+        ) == [self.token.key], "Expected the valid token to be kept"
+
+
+class PasswordHashingPoolTestCase(APITestCase, BasicTestsMixin):
+    """
+    Bounded password hashing pool test cases
+    """
+    def setUp(self):
+        self.user = self.create_user(email_verified=True)
+        self.pool = PasswordHashingPool(workers=1, max_queue=0)
+        self.release = Event()
+        return super().setUp()
+
+    def tearDown(self):
+        self.release.set()
+        return super().tearDown()
+
+    def test_saturated_pool_rejects(self):
+        """
+        Tests that a submission beyond the pool's capacity fails immediately and a freed slot is reused.
+        """
+        blocked = self.pool.submit(self.release.wait)
+        with self.assertRaises(PasswordHashingBusy):
+            self.pool.submit(make_password, DEFAULT_PASSWORD)
+        self.release.set()
+        blocked.result()
+        assert self.pool.run(
+            check_password, DEFAULT_PASSWORD, self.user.password
+        ), "Expected the password to match once a slot is free"
+
+    def test_login_saturated(self):
+        """
+        Tests that login answers 503 while every hashing slot is taken.
+        """
+        self.pool.submit(self.release.wait)
+        with patch("root.utils.password_hashing._pool", self.pool):
+            response = self.client.post(
+                "/login",
+                {"username": self.user.username, "password": DEFAULT_PASSWORD}
+            )
+        assert response.status_code == 503, "Expected status code 503"
+        assert response.data["code"] == PASSWORD_HASHING_BUSY, "Expected busy error code"
+
+
+class PasswordValidatorsTestCase(APITestCase):
+    """
+    Shared password validators test cases
+    """
+    def test_validators_built_once(self):
+        """
+        Tests that every call uses the same validator instances.
+        """
+        assert get_password_validators() is get_password_validators(), (
+            "Expected the validators to be built once"
+        )
+
+    def test_regex_validator_stateless(self):
+        """
+        Tests that errors of one validation do not leak into the next.
+        """
+        first = validate_password("lowercase")
+        second = validate_password("lowercase")
+        assert first == second, "Expected the same errors on every call"
+        assert validate_password("Paword*12") == [], "Expected a valid password"
+
+
+class BreachedPasswordValidatorTestCase(APITestCase):
+    """
+    Breached password Bloom filter test cases
+    """
+    BREACHED_PASSWORDS = ["Breached*1", "Leaked*Pass9", "Password*123"]
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        passwords_path = f"{directory.name}/passwords.txt"
+        hashes_path = f"{directory.name}/hashes.txt"
+        self.filter_path = f"{directory.name}/breached.bloom"
+        self.sha1_filter_path = f"{directory.name}/breached-sha1.bloom"
+        with open(passwords_path, "w") as file:
+            file.write("\n".join(self.BREACHED_PASSWORDS))
+        with open(hashes_path, "w") as file:
+            file.write("\n".join(
+                f"{sha1(password.encode()).hexdigest().upper()}:10"
+                for password in self.BREACHED_PASSWORDS
+            ))
+        call_command(
+            "build_breached_password_filter", passwords_path,
+            output=self.filter_path, stdout=StringIO()
+        )
+        call_command(
+            "build_breached_password_filter", hashes_path, format="sha1",
+            output=self.sha1_filter_path, stdout=StringIO()
+        )
+        return super().setUp()
+
+    def test_breached_passwords_rejected(self):
+        """
+        Tests that breached passwords are rejected and others accepted.
+        """
+        for filter_path in (self.filter_path, self.sha1_filter_path):
+            with override_settings(BREACHED_PASSWORD_FILTER_PATH=filter_path):
+                for password in self.BREACHED_PASSWORDS:
+                    assert (
+                        BreachedPasswordValidator.message in validate_password(password)
+                    ), "Expected a breached password to be rejected"
+                assert (
+                    validate_password(DEFAULT_PASSWORD) == []
+                ), "Expected a password not in the filter to be accepted"
+
+    def test_signup_breached_password(self):
+        """
+        Tests that signup fails with a breached password.
+        """
+        payload = {
+            "username": DEFAULT_USERNAME,
+            "password": self.BREACHED_PASSWORDS[0],
+            "first_name": "Test",
+            "last_name": "User",
+        }
+        with override_settings(BREACHED_PASSWORD_FILTER_PATH=self.filter_path):
+            response = self.client.post("/signup", payload)
+        assert response.status_code == 400, "Expected status code 400"
+
+
+class OTPCreationTestCase(APITestCase, BasicTestsMixin):
+    """
+    OTP creation test cases
+    """
+    def setUp(self):
+        self.user = self.create_user()
+        self.otp_type = OTPTypeChoices.EMAIL_VERIFICATION.value
+        return super().setUp()
+
+    def test_create_otp(self):
+        """
+        Tests that an OTP is created with a 6 digit value in a single insert.
+        """
+        with CaptureQueriesContext(connection) as context:
+            otp = OTP.objects.create_otp_for_user(self.user, self.otp_type)
+        statements = [
+            query["sql"].split()[0] for query in context.captured_queries
+            if "SAVEPOINT" not in query["sql"]
+        ]
+        assert statements == ["SELECT", "INSERT"], (
+            "Expected the last attempt number lookup and a single insert"
+        )
+        assert len(otp.otp) == 6 and otp.otp.isdigit(), "Expected a 6 digit OTP"
+        assert otp.attempt == 1, "Expected the first attempt"
+
+    @skipUnlessDBFeature("supports_covering_indexes")
+    def test_create_otp_collision(self):
+        """
+        Tests that a value the user already has is replaced by a new one.
+        """
+        with patch("main.managers.generate_otp_value", side_effect=["111111", "222222"]):
+            OTP.objects.create_otp_for_user(self.user, self.otp_type)
+        with patch(
+            "main.managers.generate_otp_value", side_effect=["111111", "333333"]
+        ):
+            otp = OTP.objects.create_otp_for_user(self.user, self.otp_type)
+        assert otp.otp == "333333", "Expected the colliding value to be replaced"
+
+    @skipUnlessDBFeature("supports_covering_indexes")
+    def test_create_otp_collisions_exhausted(self):
+        """
+        Tests that OTPAlreadyExistsException is raised when every attempt collides.
+        """
+        OTP.objects.create(
+            user=self.user, otp="111111", otp_type=self.otp_type,
+            validity=now() + settings.OTP_EXPIRY
+        )
+        with patch("main.managers.generate_otp_value", return_value="111111"):
+            with self.assertRaises(OTPAlreadyExistsException):
+                OTP.objects.create_otp_for_user(self.user, self.otp_type)
+
+
+class OTPBackendTestsMixin(BasicTestsMixin):
+    def setUp(self):
+        self.user = self.create_user()
+        self.otp_type = OTPTypeChoices.EMAIL_VERIFICATION.value
+        return super().setUp()
+
+    def expire_otps(self):
+        raise NotImplementedError
+
+    def verify_email(self, otp: str):
+        return self.client.post(
+            "/verify-email", {"email": self.user.username, "otp": otp}
+        )
+
+    def test_verify_email(self):
+        """
+        Tests that a valid OTP verifies the email and cannot be used again.
+        """
+        otp = OTP.objects.issue_otp(self.user, self.otp_type)
+        response = self.verify_email(otp)
+        assert response.status_code == 204, "Expected status code 204"
+        self.user.refresh_from_db()
+        assert self.user.email_verified, "Expected the email to be verified"
+        assert OTP.objects.verify_otp(
+            self.user, self.otp_type, otp
+        ) == INVALID_OTP, "Expected the used OTP to be invalidated"
+
+    def test_invalid_otp(self):
+        """
+        Tests that a wrong OTP, or an OTP of another type, is rejected as invalid.
+        """
+        otp = OTP.objects.issue_otp(self.user, self.otp_type)
+        wrong_otp = "000000" if otp != "000000" else "111111"
+        response = self.verify_email(wrong_otp)
+        assert response.status_code == 400, "Expected status code 400"
+        assert response.data["code"]["otp"] == [INVALID_OTP], "Expected invalid OTP"
+        response = self.client.post("/reset_password", {
+            "email": self.user.username, "otp": otp, "new_password": "Paword*12"
+        })
+        assert response.status_code == 400, "Expected status code 400"
+        assert response.data["code"]["otp"] == [INVALID_OTP], "Expected invalid OTP"
+
+    def test_expired_otp(self):
+        """
+        Tests that an expired OTP is rejected as expired.
+        """
+        otp = OTP.objects.issue_otp(self.user, self.otp_type)
+        with self.expire_otps():
+            response = self.verify_email(otp)
+        assert response.status_code == 400, "Expected status code 400"
+        assert response.data["code"]["otp"] == [EXPIRED_OTP], "Expected expired OTP"
+
+    def test_consume_once(self):
+        """
+        Tests that an OTP can only be consumed once.
+        """
+        otp = OTP.objects.issue_otp(self.user, self.otp_type)
+        assert OTP.objects.consume_otp(
+            self.user, self.otp_type, otp
+        ), "Expected the OTP to be consumed"
+        assert not OTP.objects.consume_otp(
+            self.user, self.otp_type, otp
+        ), "Expected a used OTP not to be consumed again"
+
+    def test_attempt_counting(self):
+        """
+        Tests that every OTP issued counts as an attempt until the OTPs are used.
+        """
+        for attempt in range(1, 3):
+            otp = OTP.objects.issue_otp(self.user, self.otp_type)
+            assert OTP.objects.get_last_attempt_number(
+                self.user, self.otp_type
+            ) == attempt, f"Expected attempt {attempt}"
+        OTP.objects.consume_otp(self.user, self.otp_type, otp)
+        assert OTP.objects.get_last_attempt_number(
+            self.user, self.otp_type
+        ) == 0, "Expected the attempts to be reset"
+
+
+class DatabaseOTPBackendTestCase(OTPBackendTestsMixin, APITestCase):
+    """
+    Database OTP backend test cases
+    """
+    @contextmanager
+    def expire_otps(self):
+        OTP.objects.update(validity=now() - timedelta(seconds=1))
+        yield
+
+
+@override_settings(OTP_BACKEND="main.otp_backends.CacheOTPBackend")
+class CacheOTPBackendTestCase(OTPBackendTestsMixin, APITestCase):
+    """
+    Cache OTP backend test cases
+    """
+    def expire_otps(self):
+        return patch(
+            "main.otp_backends.timezone.now",
+            return_value=now() + settings.OTP_EXPIRY + timedelta(seconds=1)
+        )
+
+    def test_no_rows_written(self):
+        """
+        Tests that OTPs are not stored in the database.
+        """
+        OTP.objects.issue_otp(self.user, self.otp_type)
+        assert not OTP.objects.exists(), "Expected no OTP rows"
+
+
+@override_settings(OTP_RATE_LIMITS={
+    OTPTypeChoices.EMAIL_VERIFICATION.value: {"limit": 2, "window": timedelta(minutes=5)},
+    OTPTypeChoices.FORGOT_PASSWORD.value: {"limit": 2, "window": timedelta(minutes=5)}
+})
+class OTPRateLimitTestCase(APITestCase, BasicTestsMixin):
+    """
+    OTP email rate limit test cases
+    """
+    def setUp(self):
+        self.user = self.create_user()
+        return super().setUp()
+
+    def test_forgot_password_rate_limited(self):
+        """
+        Tests that OTP requests over the limit are rejected without queries or tasks.
+        """
+        payload = {"email": self.user.username}
+        with patch("main.views.send_forgot_password_otp_email.delay") as delay:
+            for _ in range(2):
+                response = self.client.post("/forgot_password", payload)
+                assert response.status_code == 204, "Expected status code 204"
+            with self.assertNumQueries(0):
+                response = self.client.post("/forgot_password", payload)
+        assert response.status_code == 400, "Expected status code 400"
+        assert response.data["code"]["email"] == [
+            MAXIMUM_NUMBER_OF_ATTEMPTS_EXCEEDED
+        ], "Expected the maximum attempts error code"
+        assert delay.call_count == 2, "Expected no task for the rejected request"
+
+    def test_rate_limit_per_type(self):
+        """
+        Tests that each OTP type has its own limit and emails are matched case insensitively.
+        """
+        for _ in range(2):
+            check_otp_rate_limit(
+                self.user.username, OTPTypeChoices.FORGOT_PASSWORD.value
+            )
+        with self.assertRaises(ValidationError):
+            check_otp_rate_limit(
+                self.user.username.upper(), OTPTypeChoices.FORGOT_PASSWORD.value
+            )
+        with patch("main.views.resend_verification_otp_email.delay"):
+            response = self.client.post(
+                "/resend_email", {"email": self.user.username}
+            )
+        assert response.status_code == 204, "Expected status code 204"
+
+    def test_rate_limit_padded_email(self):
+        """
+        Tests that emails padded with whitespace share the limit of the email.
+        """
+        variants = [
+            self.user.username, f" {self.user.username}",
+            f"{self.user.username} ", f"\t{self.user.username.upper()}\n"
+        ]
+        with patch("main.views.send_forgot_password_otp_email.delay") as delay:
+            responses = [
+                self.client.post("/forgot_password", {"email": email})
+                for email in variants
+            ]
+        assert [response.status_code for response in responses] == [
+            204, 204, 400, 400
+        ], "Expected the padded variants to be rate limited"
+        assert delay.call_count == 2, "Expected no task for the rejected requests"
+
+
+class RecordingSMTPHandler:
+    def __init__(self):
+        self.sessions = 0
+        self.messages = []
+        # Replies to recipients the server refuses
+        self.refused = {}
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refused:
+            return self.refused[address]
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+class PooledMailDeliveryTestCase(APITestCase):
+    """
+    Queued email delivery over a pooled SMTP connection, against a local aiosmtpd server
+    """
+    def setUp(self):
+        self.handler = RecordingSMTPHandler()
+        with socket() as free_socket:
+            free_socket.bind(("127.0.0.1", 0))
+            port = free_socket.getsockname()[1]
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=port)
+        self.controller.start()
+        self.addCleanup(self.controller.stop)
+        self.addCleanup(mail_connection.close)
+        settings_override = override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1", EMAIL_PORT=port,
+            EMAIL_HOST_USER="", EMAIL_HOST_PASSWORD="", EMAIL_USE_TLS=False,
+            EMAIL_BATCH_SIZE=2
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        mail_connection.close()
+        return super().setUp()
+
+    def queue_emails(self, count: int):
+        for index in range(count):
+            queue_email(
+                f"Subject {index}", f"<p>{index}</p>", [f"user{index}@payfirst.com"]
+            )
+
+    def test_batches_share_one_connection(self):
+        """
+        Tests that queued emails are sent in batches over a single SMTP session.
+        """
+        self.queue_emails(5)
+        assert deliver_queued_emails() == 5, "Expected 5 emails delivered"
+        self.queue_emails(1)
+        assert deliver_queued_emails() == 1, "Expected 1 email delivered"
+        assert len(self.handler.messages) == 6, "Expected 6 emails received"
+        assert self.handler.sessions == 1, "Expected the connection to be reused"
+
+    @override_settings(EMAIL_KEEPALIVE_INTERVAL=3600)
+    def test_reconnects_after_drop(self):
+        """
+        Tests that a connection dropped between deliveries is replaced and nothing is lost.
+        """
+        self.queue_emails(1)
+        deliver_queued_emails()
+        mail_connection._connection.connection.sock.shutdown(SHUT_RDWR)
+        self.queue_emails(2)
+        assert deliver_queued_emails() == 2, "Expected 2 emails delivered"
+        assert len(self.handler.messages) == 3, "Expected 3 emails received"
+        assert self.handler.sessions == 2, "Expected a new connection"
+
+    def test_refused_recipient_is_dead_lettered(self):
+        """
+        Tests that an email rejected with a 5xx reply is dropped once and the rest of its batch is sent.
+        """
+        self.handler.refused["user1@payfirst.com"] = "550 No such user"
+        self.queue_emails(3)
+        assert deliver_queued_emails() == 3, "Expected 3 emails taken from the outbox"
+        assert deliver_queued_emails() == 0, "Expected nothing left to deliver"
+        recipients = [message.rcpt_tos for message in self.handler.messages]
+        assert recipients == [
+            ["user0@payfirst.com"], ["user2@payfirst.com"]
+        ], "Expected each accepted email sent once"
+        redis = get_redis_connection("default")
+        assert redis.llen(MAIL_OUTBOX_KEY) == 0, "Expected an empty outbox"
+        assert redis.llen(MAIL_PROCESSING_KEY) == 0, "Expected nothing left in processing"
+        dead_letters = [json.loads(item) for item in redis.lrange(MAIL_DEAD_LETTER_KEY, 0, -1)]
+        assert [item["recipient_list"] for item in dead_letters] == [
+            ["user1@payfirst.com"]
+        ], "Expected the refused email dead lettered"
+
+    @override_settings(EMAIL_MAX_DELIVERY_ATTEMPTS=2, EMAIL_RETRY_DELAY=0)
+    def test_temporary_failure_is_retried_by_beat(self):
+        """
+        Tests that an email hitting a 4xx reply is only retried by the beat run, then dead lettered.
+        """
+        self.handler.refused["user0@payfirst.com"] = "450 Mailbox busy"
+        self.queue_emails(2)
+        assert deliver_queued_emails() == 2, "Expected 2 emails taken from the outbox"
+        redis = get_redis_connection("default")
+        assert redis.zcard(MAIL_DEFERRED_KEY) == 1, "Expected the email deferred"
+        assert deliver_queued_emails() == 0, "Expected no retry outside the beat run"
+        assert deliver_queued_emails(
+            requeue_deferred=True
+        ) == 1, "Expected the deferred email retried"
+        assert redis.zcard(MAIL_DEFERRED_KEY) == 0, "Expected no more retries"
+        assert redis.llen(MAIL_DEAD_LETTER_KEY) == 1, "Expected the email dead lettered"
+        assert len(self.handler.messages) == 1, "Expected the other email sent once"
+
+    def test_deferred_email_waits_for_retry_time(self):
+        """
+        Tests that a deferred email is not retried before EMAIL_RETRY_DELAY has passed.
+        """
+        self.handler.refused["user0@payfirst.com"] = "421 Try again later"
+        self.queue_emails(1)
+        deliver_queued_emails()
+        assert deliver_queued_emails(
+            requeue_deferred=True
+        ) == 0, "Expected the email to wait for its retry time"
+        redis = get_redis_connection("default")
+        [(_, retry_at)] = redis.zrange(MAIL_DEFERRED_KEY, 0, -1, withscores=True)
+        assert retry_at > time(), "Expected the retry scheduled in the future"
+
+    def test_interrupted_delivery_is_restored(self):
+        """
+        Tests that emails left in processing by a killed worker are sent by the next run.
+        """
+        self.queue_emails(2)
+        redis = get_redis_connection("default")
+        redis.lmove(MAIL_OUTBOX_KEY, MAIL_PROCESSING_KEY, "LEFT", "RIGHT")
+        assert deliver_queued_emails() == 2, "Expected 2 emails delivered"
+        recipients = [message.rcpt_tos for message in self.handler.messages]
+        assert recipients == [
+            ["user0@payfirst.com"], ["user1@payfirst.com"]
+        ], "Expected the restored email sent first"
+        assert redis.llen(MAIL_PROCESSING_KEY) == 0, "Expected nothing left in processing"
+
+    def test_one_delivery_at_a_time(self):
+        """
+        Tests that a delivery started while another holds the lock leaves the outbox alone.
+        """
+        self.queue_emails(1)
+        redis = get_redis_connection("default")
+        lock = redis.lock(MAIL_DELIVERY_LOCK_KEY, timeout=60)
+        assert lock.acquire(blocking=False), "Expected the lock to be free"
+        try:
+            assert deliver_queued_emails() == 0, "Expected the delivery skipped"
+        finally:
+            lock.release()
+        assert redis.llen(MAIL_OUTBOX_KEY) == 1, "Expected the email left queued"
+
+
+class EmailRenderingTestCase(APITestCase, BasicTestsMixin):
+    """
+    Cached email template rendering test cases
+    """
+    TEMPLATES = (
+        "email/welcome.html", "email/reset_password.html", "email/email_verify.html"
+    )
+
+    def setUp(self):
+        prerendered_templates.clear()
+        email_template_counter.reset()
+        self.user = self.create_user(first_name="<b>Tom & \"Jerry\"</b>")
+        self.context = {"expiry": 5, "app_title": "PayBuddy"}
+        return super().setUp()
+
+    def test_render_matches_template(self):
+        """
+        Tests that cached renders match a full render of each template, with escaped fields.
+        """
+        for template_name in self.TEMPLATES:
+            for otp in ("123456", "654321"):
+                html = render_email(
+                    template_name, self.context,
+                    {"user.first_name": self.user.first_name, "otp": otp}
+                )
+                assert html == render_to_string(
+                    template_name, {**self.context, "user": self.user, "otp": otp}
+                ), f"Expected {template_name} to render as without the cache"
+        assert email_template_counter.misses == 3, "Expected one render per template"
+        assert email_template_counter.hits == 3, "Expected cached templates to be reused"
+
+    def test_otp_email_queued(self):
+        """
+        Tests that the OTP email tasks share the rendering and queue the email.
+        """
+        with patch("main.tasks.deliver_queued_emails.delay"):
+            send_forgot_password_otp_email(self.user.id)
+        payload = json.loads(get_redis_connection("default").lpop(MAIL_OUTBOX_KEY))
+        assert payload["recipient_list"] == [self.user.username], "Expected the user's email"
+        assert "&lt;b&gt;Tom &amp; &quot;Jerry&quot;&lt;/b&gt;" in payload["html_message"], (
+            "Expected the escaped first name"
+        )
+
+
+class PurgeExpiredOTPsTestCase(APITestCase, BasicTestsMixin):
+    """
+    Expired OTP purge task test cases
+    """
+    def setUp(self):
+        user = self.create_user()
+        validities = [
+            now() - settings.OTP_PURGE_AFTER - timedelta(minutes=index + 1)
+            for index in range(3)
+        ] + [now() - timedelta(seconds=1), now() + settings.OTP_EXPIRY]
+        self.otps = [
+            OTP.objects.create(
+                user=user, otp=f"10000{index}",
+                otp_type=OTPTypeChoices.EMAIL_VERIFICATION.value,
+                validity=validity
+            )
+            for index, validity in enumerate(validities)
+        ]
+        return super().setUp()
+
+    @override_settings(OTP_PURGE_BATCH_SIZE=2)
+    def test_purge_expired_otps(self):
+        """
+        Tests that only OTPs expired for longer than OTP_PURGE_AFTER are deleted, across several batches.
+        """
+        assert purge_expired_otps() == 3, "Expected the 3 old OTPs to be deleted"
+        assert set(OTP.objects.values_list("pk", flat=True)) == {
+            otp.pk for otp in self.otps[3:]
+        }, "Expected recently expired and valid OTPs to be kept"
+
+    def test_purge_expired_otps_command(self):
+        """
+        Tests the management command with an explicit batch size.
+        """
+        stdout = StringIO()
+        call_command("purge_expired_otps", batch_size=1, stdout=stdout)
+        assert "Deleted 3 expired OTPs" in stdout.getvalue(), "Expected 3 deleted OTPs"
+
+
+class TaskResultsTestCase(APITestCase):
+    """
+    Task result storage and retention test cases
+    """
+    def test_results_are_ignored_by_default(self):
+        """
+        Tests that fire and forget tasks do not store results.
+        """
+        assert send_forgot_password_otp_email.ignore_result, "Expected results to be ignored"
+        assert purge_expired_otps.ignore_result, "Expected results to be ignored"
+
+    @override_settings(TASK_RESULT_PURGE_BATCH_SIZE=2)
+    def test_purge_task_results(self):
+        """
+        Tests that only results older than TASK_RESULT_RETENTION are deleted, across several batches.
+        """
+        for index in range(5):
+            TaskResult.objects.create(task_id=f"task-{index}", status="SUCCESS")
+        TaskResult.objects.filter(task_id__in=["task-0", "task-1", "task-2"]).update(
+            date_done=now() - settings.TASK_RESULT_RETENTION - timedelta(minutes=1)
+        )
+        assert purge_task_results() == 3, "Expected the 3 old results to be deleted"
+        assert set(TaskResult.objects.values_list("task_id", flat=True)) == {
+            "task-3", "task-4"
+        }, "Expected recent results to be kept"
+
+
+class OTPFlowQueryCountTestCase(APITestCase, BasicTestsMixin):
+    """
+    Query counts of the OTP endpoints with the database OTP backend
+    """
+    def setUp(self):
+        self.user = self.create_user()
+        return super().setUp()
+
+    def get_statements(self, context) -> list:
+        return [
+            query["sql"].split()[0] for query in context.captured_queries
+            if "SAVEPOINT" not in query["sql"]
+        ]
+
+    def test_forgot_password_queries(self):
+        """
+        Tests that forgot password looks the user up once.
+        """
+        with patch("main.views.send_forgot_password_otp_email.delay"):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(
+                    "/forgot_password", {"email": self.user.username}
+                )
+        assert response.status_code == 204, "Expected status code 204"
+        assert self.get_statements(context) == ["SELECT"], "Expected one query"
+
+    def test_verify_email_queries(self):
+        """
+        Tests that email verification reads the user and OTP in one query and consumes it in one.
+        """
+        otp = OTP.objects.issue_otp(
+            self.user, OTPTypeChoices.EMAIL_VERIFICATION.value
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                "/verify-email", {"email": self.user.username, "otp": otp}
+            )
+        assert response.status_code == 204, "Expected status code 204"
+        assert self.get_statements(context) == [
+            "SELECT", "DELETE", "UPDATE"
+        ], "Expected a select, a delete and an update"
+
+    def test_reset_password_queries(self):
+        """
+        Tests that password reset reads the user and OTP in one query and consumes it in one.
+        """
+        otp = OTP.objects.issue_otp(
+            self.user, OTPTypeChoices.FORGOT_PASSWORD.value
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post("/reset_password", {
+                "email": self.user.username, "otp": otp,
+                "new_password": "Paword*12"
+            })
+        assert response.status_code == 204, "Expected status code 204"
+        assert self.get_statements(context) == [
+            "SELECT", "DELETE", "UPDATE"
+        ], "Expected a select, a delete and an update"
+        self.user.refresh_from_db()
+        assert self.user.check_password("Paword*12"), "Expected the new password"
@@ -37,5 +37,9 @@ urlpatterns = [
     path(
         "resend_email", views.ResendVerificationEmailView.as_view(),
         name="resend_email"
+    ),
+    path(
+        "metrics", views.MetricsAPIView.as_view(),
+        name="metrics"
     )
 ]
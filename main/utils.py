@@ -1,11 +1,18 @@
-import re
-
 from django.conf import settings
-from django.core.cache import caches
 from django.utils import timezone
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import EmailField
+
+from main.error_codes import MAXIMUM_NUMBER_OF_ATTEMPTS_EXCEEDED
 
-from root.utils.utils import get_all_cache_keys
+from main.models import AppSettings, ModuleInfo
+from root.utils.constants.cache_keys import (APP_SETTINGS_NAMESPACE, KEYS,
+                                             MODULE_INFO_NAMESPACE,
+                                             OTP_RATE_LIMIT_KEY)
+from root.utils.rate_limit import hit_rate_limit
+from root.utils.tiered_cache import get_tiered, invalidate_tiered
+from root.utils.utils import bump_cache_namespace_version
 
 
 def is_auth_token_expired(token: Token) -> bool:
@@ -15,12 +22,52 @@ def is_auth_token_expired(token: Token) -> bool:
 
 
 def clear_meta_api_cache():
-    CACHE_KEY_REGEX_PATTERN = r"^cache-api-(0|.+)-0$"
-    cache = caches['default']
-    pattern_glob = "cache-api-*-0"
-    keys = get_all_cache_keys(pattern_glob)
-    for key in keys:
-        if isinstance(key, bytes):
-            key = key.decode()
-        if re.match(CACHE_KEY_REGEX_PATTERN, key):
-            cache.delete(key)
+    bump_cache_namespace_version(KEYS["/meta"])
+
+
+def get_app_settings() -> AppSettings | None:
+    return get_tiered(APP_SETTINGS_NAMESPACE, AppSettings.objects.last)
+
+
+def get_module_infos() -> list[ModuleInfo]:
+    return get_tiered(
+        MODULE_INFO_NAMESPACE,
+        lambda: list(ModuleInfo.objects.select_related("model"))
+    )
+
+
+def clear_app_settings_cache():
+    invalidate_tiered(APP_SETTINGS_NAMESPACE)
+    clear_meta_api_cache()
+
+
+def clear_module_info_cache():
+    invalidate_tiered(MODULE_INFO_NAMESPACE)
+    clear_meta_api_cache()
+
+
+def check_otp_rate_limit(email: str, otp_type: int) -> None:
+    """
+    Counts a request for an OTP email against OTP_RATE_LIMITS.
+
+    Runs in Redis alone, so rejected requests never reach the database or
+    the task queue. The email is keyed as the serializers' EmailField
+    cleans it, so padded or differently cased variants share one limit.
+
+    Raises:
+        ValidationError: If the email address requested too many OTPs of the type.
+    """
+    rate_limit = settings.OTP_RATE_LIMITS[otp_type]
+    try:
+        email = EmailField().run_validation(email)
+    except ValidationError:
+        # Rejected by the serializer later, still counted against the limit
+        email = email.strip()
+    key = OTP_RATE_LIMIT_KEY.format(otp_type=otp_type, email=email.lower())
+    if hit_rate_limit(key, rate_limit["limit"], rate_limit["window"]) is not None:
+        raise ValidationError(
+            {
+                "email": ["Too many attempts, please try again after some time."]
+            },
+            code=MAXIMUM_NUMBER_OF_ATTEMPTS_EXCEEDED
+        )
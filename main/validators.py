@@ -1,3 +1,4 @@
+from functools import cache
 from re import match
 
 from django.contrib.auth import get_user_model
@@ -6,7 +7,8 @@ from django.contrib.auth.password_validation import (
     UserAttributeSimilarityValidator)
 from django.core.exceptions import ValidationError
 
-from root.utils.password_validations import PasswordRegexValidator
+from root.utils.password_validations import (BreachedPasswordValidator,
+                                             PasswordRegexValidator)
 
 User = get_user_model()
 
@@ -40,16 +42,27 @@ def user_exists(**kwargs):
     return User.objects.filter(**kwargs).exists()
 
 
+@cache
+def get_password_validators() -> tuple:
+    """
+    Returns the password validators, built once per process.
+
+    CommonPasswordValidator reads and decompresses its password list when
+    it is created, so the instances are shared by every call. None of them
+    keep state between calls, which makes sharing them across threads safe.
+    """
+    return (
+        CommonPasswordValidator(), MinimumLengthValidator(),
+        NumericPasswordValidator(), UserAttributeSimilarityValidator(),
+        PasswordRegexValidator(), BreachedPasswordValidator()
+    )
+
+
 def validate_password(password: str, user: User = None) -> list:
-    validators = {
-        CommonPasswordValidator, MinimumLengthValidator,
-        NumericPasswordValidator, UserAttributeSimilarityValidator,
-        PasswordRegexValidator
-    }
     errors = []
-    for validator in validators:
+    for validator in get_password_validators():
         try:
-            validator().validate(password, user=user)
+            validator.validate(password, user=user)
         except ValidationError as exc:
             errors.extend(exc.messages)
     return errors
@@ -1,28 +1,29 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db.transaction import atomic, on_commit
-from django.utils.decorators import method_decorator
 from django.utils.timezone import now
-from django.views.decorators.cache import cache_page
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
-from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.generics import RetrieveAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
-from main.choices import OTPTypeChoices
-from main.error_codes import MAXIMUM_NUMBER_OF_ATTEMPTS_EXCEEDED
-from main.models import OTP, AppSettings, ModuleInfo
+from main.choices import AuthTokenTypeChoices, OTPTypeChoices
 from main.models import User as UserModel
 from main.tasks import (resend_verification_otp_email,
                         send_forgot_password_otp_email,
                         send_verification_email_task)
-from main.utils import is_auth_token_expired
+from main.utils import (check_otp_rate_limit, get_app_settings,
+                        get_module_infos, is_auth_token_expired)
+from root.utils.authentication import (ExpiringTokenAuthentication,
+                                       SignedTokenAuthentication)
 from root.utils.error_codes import EMAIL_NOT_VERIFIED
+from root.utils.metrics import get_metrics
+from root.utils.signed_tokens import issue_signed_token
 
 from .serializers import (ChangePasswordSerializer,
                           EmailVerificationSerializer,
@@ -60,13 +61,21 @@ class LoginAPIView(ObtainAuthToken):
             raise PermissionDenied(
                 "Email is not verified.", code=EMAIL_NOT_VERIFIED
             )
+        user.last_login = now()
+        if settings.AUTH_TOKEN_TYPE == AuthTokenTypeChoices.SIGNED:
+            return Response({
+                'token': issue_signed_token(user),
+                'token_type': SignedTokenAuthentication.keyword
+            })
         token, created = Token.objects.get_or_create(user=user)
         if not created:
             if is_auth_token_expired(token):
                 token.delete()
                 token = Token.objects.create(user=user)
-        user.last_login = now()
-        return Response({'token': token.key})
+        return Response({
+            'token': token.key,
+            'token_type': ExpiringTokenAuthentication.keyword
+        })
 
 
 class LogoutAPIView(APIView):
@@ -95,39 +104,33 @@ class UserProfileAPIView(RetrieveAPIView):
     queryset = User.objects.all()
 
     def get_object(self) -> UserModel:
-        return self.request.user
+        user = self.request.user
+        # Users rebuilt from a cached or signed token may not carry every field
+        fields = set(self.serializer_class.Meta.fields)
+        if deferred_fields := user.get_deferred_fields() & fields:
+            user.refresh_from_db(fields=deferred_fields)
+        return user
 
 
-@method_decorator(cache_page(timeout=None, key_prefix="meta_api"), name='dispatch')
 class MetaAPIView(RetrieveAPIView):
     serializer_class = MetaAPISerializer
 
     def get_object(self) -> dict:
         data = {
-            "app_settings": AppSettings.objects.last(),
-            "modules": ModuleInfo.objects.all()
+            "app_settings": get_app_settings(),
+            "modules": get_module_infos()
         }
         return data
 
 
 class ForgotPasswordAPIView(APIView):
     def post(self, request: Request) -> Response:
+        # Checked before the serializer looks the user up
+        if isinstance(email := request.data.get('email'), str):
+            check_otp_rate_limit(email, OTPTypeChoices.FORGOT_PASSWORD.value)
         serializer = ForgotPasswordSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = User.objects.filter(
-            username=serializer.validated_data['email'], is_active=True
-        ).first()
-        attempt = OTP.objects.get_last_attempt_number(
-            user=user,
-            otp_type=OTPTypeChoices.FORGOT_PASSWORD.value
-        )
-        if attempt >= settings.OTP_MAX_ATTEMPTS:
-            raise ValidationError(
-                {
-                    "email": ["Too many attempts, please try again after some time."]
-                },
-                code=MAXIMUM_NUMBER_OF_ATTEMPTS_EXCEEDED
-            )
+        user = serializer.validated_data['user']
         send_forgot_password_otp_email.delay(user.id)
         return Response(status=204)
 
@@ -150,20 +153,25 @@ class EmailVerificationAPI(APIView):
 
 class ResendVerificationEmailView(APIView):
     def post(self, request):
+        # Checked before the serializer looks the user up
+        if isinstance(email := request.data.get("email"), str):
+            check_otp_rate_limit(
+                email, OTPTypeChoices.EMAIL_VERIFICATION.value
+            )
         serializer = ResendVerificationEmailSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data["email"]
-        attempt = OTP.objects.get_last_attempt_number(
-            user=user, otp_type=OTPTypeChoices.EMAIL_VERIFICATION.value
-        )
-        if attempt >= settings.OTP_MAX_ATTEMPTS:
-            raise ValidationError(
-                {
-                    "email": ["Too many attempts, please try again after some time."]
-                },
-                code=MAXIMUM_NUMBER_OF_ATTEMPTS_EXCEEDED
-            )
         resend_verification_otp_email.delay(
             user.id
         )
         return Response(status=204)
+
+
+class MetricsAPIView(APIView):
+    """
+    Returns the cache and timing metrics of the worker process serving the request.
+    """
+    permission_classes = (IsAuthenticated, IsAdminUser)
+
+    def get(self, request: Request) -> Response:
+        return Response(get_metrics())
@@ -63,6 +63,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "root.utils.middlewares.cache.CacheFetchMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "django.middleware.http.ConditionalGetMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -162,7 +163,8 @@ REST_FRAMEWORK = {
     ],
 
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "root.utils.authentication.ExpiringTokenAuthentication"
+        "root.utils.authentication.ExpiringTokenAuthentication",
+        "root.utils.authentication.SignedTokenAuthentication"
     ],
 
     "DEFAULT_FILTER_BACKENDS": [
@@ -192,6 +194,17 @@ AUTH_TOKEN_EXPIRY = timedelta(
     days=env.int("AUTH_TOKEN_EXPIRY_DAYS", 0)
 )
 
+# Upper bound in seconds for cached token lookups, see root.utils.token_cache
+AUTH_TOKEN_CACHE_TIMEOUT = env.int("AUTH_TOKEN_CACHE_TIMEOUT", default=300)
+
+# Token type issued by LoginAPIView, either "expiring" (database backed) or
+# "signed" (stateless, see root.utils.signed_tokens). Both are accepted
+# while clients migrate.
+AUTH_TOKEN_TYPE = env("AUTH_TOKEN_TYPE", default="expiring")
+
+# Rows deleted per statement by main.tasks.purge_expired_auth_tokens
+AUTH_TOKEN_PURGE_BATCH_SIZE = env.int("AUTH_TOKEN_PURGE_BATCH_SIZE", default=1000)
+
 
 # Django Cors Headers
 # https://pypi.org/project/django-cors-headers/
@@ -259,6 +272,22 @@ EMAIL_HOST_USER = env("EMAIL_HOST_USER", default="9b0f6e001@smtp-brevo.com")
 EMAIL_HOST_PASSWORD = env("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = env("DEFAULT_FROM_EMAIL", default=EMAIL_HOST_USER)
 EMAIL_USE_TLS = True
+# Seconds before a blocking SMTP operation fails, so a dead connection
+# cannot hang a worker
+EMAIL_TIMEOUT = env.int("EMAIL_TIMEOUT", default=10)
+# Seconds a pooled SMTP connection may stay idle before it is checked with
+# a NOOP, see root.utils.mail
+EMAIL_KEEPALIVE_INTERVAL = env.int("EMAIL_KEEPALIVE_INTERVAL", default=30)
+# Queued emails taken from the outbox per batch and batches per delivery
+# run, see main.tasks.deliver_queued_emails
+EMAIL_BATCH_SIZE = env.int("EMAIL_BATCH_SIZE", default=50)
+EMAIL_MAX_BATCHES = env.int("EMAIL_MAX_BATCHES", default=20)
+# Temporary failures an email may hit before it is dead lettered, seconds
+# before its first retry, doubled on every later one, and how many dead
+# lettered emails are kept
+EMAIL_MAX_DELIVERY_ATTEMPTS = env.int("EMAIL_MAX_DELIVERY_ATTEMPTS", default=5)
+EMAIL_RETRY_DELAY = env.int("EMAIL_RETRY_DELAY", default=60)
+EMAIL_DEAD_LETTER_SIZE = env.int("EMAIL_DEAD_LETTER_SIZE", default=1000)
 
 
 PASSWORD_RESET_TIMEOUT = env.int(
@@ -274,6 +303,16 @@ RESET_PASSWORD_URL = env(
 
 AUTH_USER_MODEL = 'main.User'
 
+# Threads hashing passwords per process and how many more hashes may wait
+# for one before requests are rejected with 503, see
+# root.utils.password_hashing
+PASSWORD_HASHING_WORKERS = env.int("PASSWORD_HASHING_WORKERS", default=2)
+PASSWORD_HASHING_QUEUE_SIZE = env.int("PASSWORD_HASHING_QUEUE_SIZE", default=8)
+# Bloom filter of breached passwords rejected on signup and password
+# changes, built with the build_breached_password_filter command. Empty
+# disables the check.
+BREACHED_PASSWORD_FILTER_PATH = env("BREACHED_PASSWORD_FILTER_PATH", default="")
+
 
 EMAIL_VERIFICATION_URL = env(
     "EMAIL_VERIFICATION_URL",
@@ -286,6 +325,7 @@ EMAIL_VERIFICATION_URL = env(
 REDIS_HOST = env("REDIS_HOST", default="localhost")
 REDIS_PORT = env.int("REDIS_PORT", default=6379)
 REDIS_CACHE_DB = env.int("REDIS_CACHE_DB", default=1)
+REDIS_RESULT_DB = env.int("REDIS_RESULT_DB", default=2)
 
 CACHES = {
     "default": {
@@ -294,6 +334,23 @@ CACHES = {
     }
 }
 
+# Seconds API responses stay cached, see root.utils.middlewares.cache
+API_CACHE_TIMEOUT = env.int("API_CACHE_TIMEOUT", default=86400)
+# Responses larger than this many bytes are not cached
+API_CACHE_MAX_SIZE = env.int("API_CACHE_MAX_SIZE", default=256 * 1024)
+# Seconds the last cached response is kept to be served while an
+# invalidated entry is rebuilt by a single request
+API_CACHE_STALE_TIMEOUT = env.int("API_CACHE_STALE_TIMEOUT", default=3600)
+# Seconds after which a rebuild lock expires if never released
+API_CACHE_LOCK_TIMEOUT = env.int("API_CACHE_LOCK_TIMEOUT", default=10)
+# Seconds a request without a stale copy waits for another request's rebuild
+API_CACHE_LOCK_WAIT = env.float("API_CACHE_LOCK_WAIT", default=2.0)
+# Seconds a process serves its local copy of app settings and module info
+# before checking for invalidations, see root.utils.tiered_cache
+TIERED_CACHE_LOCAL_TIMEOUT = env.int("TIERED_CACHE_LOCAL_TIMEOUT", default=30)
+TIERED_CACHE_LOCAL_MAX_ENTRIES = env.int("TIERED_CACHE_LOCAL_MAX_ENTRIES", default=128)
+TIERED_CACHE_SHARED_TIMEOUT = env.int("TIERED_CACHE_SHARED_TIMEOUT", default=86400)
+
 # RabbitMQ
 RABBITMQ_DEFAULT_USER = env("RABBITMQ_DEFAULT_USER", default="rabbit")
 RABBITMQ_DEFAULT_PASS = env("RABBITMQ_DEFAULT_PASS", default="123")
@@ -304,7 +361,20 @@ RABBITMQ_PORT = env.int("RABBITMQ_PORT", default=5672)
 CELERY_BROKER_URL = f"amqp://{RABBITMQ_DEFAULT_USER}:{RABBITMQ_DEFAULT_PASS}@{RABBITMQ_HOST}:{RABBITMQ_PORT}//"
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
-CELERY_RESULT_BACKEND = "django-db"
+# Tasks are fire and forget unless declared with ignore_result=False, whose
+# results are then kept in Redis for CELERY_RESULT_EXPIRES
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_RESULT_BACKEND = env(
+    "CELERY_RESULT_BACKEND",
+    default=f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_RESULT_DB}"
+)
+CELERY_RESULT_EXPIRES = timedelta(
+    seconds=env.int("CELERY_RESULT_EXPIRES_SECONDS", default=86400)
+)
+# Rows left in django_celery_results older than this are deleted by
+# main.tasks.purge_task_results, in batches of TASK_RESULT_PURGE_BATCH_SIZE
+TASK_RESULT_RETENTION = timedelta(days=env.int("TASK_RESULT_RETENTION_DAYS", default=7))
+TASK_RESULT_PURGE_BATCH_SIZE = env.int("TASK_RESULT_PURGE_BATCH_SIZE", default=1000)
 CELERY_TASK_ACKS_LATE = True
 CELERY_TASK_REJECT_ON_WORKER_LOST = True
 CELERY_TASK_TIME_LIMIT = 60
@@ -316,9 +386,63 @@ CELERY_BEAT_SCHEDULE = {
         "task": "user.tasks.mark_transactions_inactive",
         "schedule": crontab(minute="30", hour="12"),  # Runs Every day at 5:30 AM UTC
     },
+    "purge-expired-auth-tokens-every-hour": {
+        "task": "main.tasks.purge_expired_auth_tokens",
+        "schedule": crontab(minute="15"),
+    },
+    "purge-expired-otps-every-hour": {
+        "task": "main.tasks.purge_expired_otps",
+        "schedule": crontab(minute="45"),
+    },
+    "purge-task-results-every-day": {
+        "task": "main.tasks.purge_task_results",
+        "schedule": crontab(minute="0", hour="3"),
+    },
+    # Retries deferred emails once due and picks up any left in the outbox
+    "deliver-queued-emails-every-minute": {
+        "task": "main.tasks.deliver_queued_emails",
+        "schedule": crontab(),
+        "kwargs": {"requeue_deferred": True},
+    },
 }
 
 OTP_EXPIRY = timedelta(
     **{key: int(value) for key, value in env.dict("OTP_EXPIRY").items()}
 )
 OTP_MAX_ATTEMPTS = env.int("OTP_MAX_ATTEMPTS", default=5)
+# OTP emails that can be requested per email address within a sliding
+# window, keyed by main.choices.OTPTypeChoices value, see
+# main.utils.check_otp_rate_limit
+OTP_RATE_LIMITS = {
+    # Email verification
+    1: {
+        "limit": env.int("EMAIL_VERIFICATION_OTP_LIMIT", default=OTP_MAX_ATTEMPTS),
+        "window": timedelta(seconds=env.int(
+            "EMAIL_VERIFICATION_OTP_WINDOW_SECONDS",
+            default=int(OTP_EXPIRY.total_seconds())
+        ))
+    },
+    # Forgot password
+    2: {
+        "limit": env.int("FORGOT_PASSWORD_OTP_LIMIT", default=OTP_MAX_ATTEMPTS),
+        "window": timedelta(seconds=env.int(
+            "FORGOT_PASSWORD_OTP_WINDOW_SECONDS",
+            default=int(OTP_EXPIRY.total_seconds())
+        ))
+    }
+}
+# Where OTPs are kept: main.otp_backends.DatabaseOTPBackend (OTP table) or
+# main.otp_backends.CacheOTPBackend (Redis, expiring natively)
+OTP_BACKEND = env("OTP_BACKEND", default="main.otp_backends.DatabaseOTPBackend")
+# OTPs expired for longer than this are deleted by main.tasks.purge_expired_otps,
+# in batches of OTP_PURGE_BATCH_SIZE rows
+OTP_PURGE_AFTER = timedelta(hours=env.int("OTP_PURGE_AFTER_HOURS", default=1))
+OTP_PURGE_BATCH_SIZE = env.int("OTP_PURGE_BATCH_SIZE", default=1000)
+
+# Decimal places of money amounts, stored as integer counts of minor units
+# (10 ** MONEY_SCALE per major unit) and converted by
+# root.utils.fields.MoneyField at the API. Changing it requires converting
+# stored amounts, see the convert_amounts_to_minor_units command.
+MONEY_SCALE = env.int("MONEY_SCALE", default=2)
+# Most transactions accepted by one request to /user/transaction/bulk/
+BULK_TRANSACTIONS_MAX_ITEMS = env.int("BULK_TRANSACTIONS_MAX_ITEMS", default=500)
@@ -1,17 +1,24 @@
+from django.core.signing import BadSignature
 from django.utils.translation import gettext_lazy
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
 from main.utils import is_auth_token_expired
+from root.utils.signed_tokens import (is_signed_token_revoked,
+                                      load_signed_token)
+from root.utils.token_cache import cache_token, get_cached_token
 
 
 class ExpiringTokenAuthentication(TokenAuthentication):
     def authenticate_credentials(self, key):
-        model = self.get_model()
-        try:
-            token = model.objects.select_related('user').get(key=key)
-        except model.DoesNotExist:
-            raise AuthenticationFailed(gettext_lazy('Invalid token.'))
+        token = get_cached_token(key)
+        if token is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise AuthenticationFailed(gettext_lazy('Invalid token.'))
+            cache_token(token)
 
         if not token.user.is_active:
             raise AuthenticationFailed(
@@ -21,3 +28,28 @@ class ExpiringTokenAuthentication(TokenAuthentication):
                 gettext_lazy("Session Expired, please login again")
             )
         return (token.user, token)
+
+
+class SignedTokenAuthentication(TokenAuthentication):
+    """
+    Authenticates `Authorization: Bearer <token>` headers carrying signed tokens.
+
+    The signature and expiry are verified in process, so the only lookup
+    left is the revocation check of the token and its user. Password
+    changes and deactivation revoke every token issued to the user before.
+    """
+    keyword = "Bearer"
+
+    def authenticate_credentials(self, key):
+        try:
+            token = load_signed_token(key)
+        except BadSignature:
+            raise AuthenticationFailed(gettext_lazy('Invalid token.'))
+
+        if token.is_expired:
+            raise AuthenticationFailed(
+                gettext_lazy("Session Expired, please login again")
+            )
+        if is_signed_token_revoked(token):
+            raise AuthenticationFailed(gettext_lazy('Invalid token.'))
+        return (token.user, token)
@@ -0,0 +1,85 @@
+import mmap
+from functools import lru_cache
+from hashlib import sha1
+from math import ceil, log
+from struct import Struct
+from typing import Iterable
+
+# File layout: header followed by the bit array, bit i being bit i % 8 of
+# byte i // 8. The header holds a magic, the number of bits and the number
+# of hash functions.
+MAGIC = b"PFBLOOM1"
+HEADER = Struct("<8sQI")
+
+
+def optimal_parameters(capacity: int, false_positive_rate: float) -> tuple[int, int]:
+    """Returns the number of bits and hash functions for capacity entries at a false positive rate."""
+    num_bits = ceil(-capacity * log(false_positive_rate) / log(2) ** 2)
+    num_hashes = max(1, round(num_bits / capacity * log(2)))
+    return max(num_bits, 8), num_hashes
+
+
+def password_digest(password: str) -> bytes:
+    """Entries are SHA-1 digests so breach lists published as SHA-1 hashes can be loaded as they are."""
+    return sha1(password.encode()).digest()
+
+
+def bit_indexes(digest: bytes, num_bits: int, num_hashes: int) -> Iterable[int]:
+    # Double hashing over two 64 bit halves of the digest
+    first = int.from_bytes(digest[:8], "little")
+    second = int.from_bytes(digest[8:16], "little") | 1
+    return ((first + i * second) % num_bits for i in range(num_hashes))
+
+
+class BloomFilter:
+    """
+    Read only Bloom filter over a memory mapped file built by build_bloom_filter.
+
+    The file is mapped read only, so every process that opens it shares
+    the same pages of the OS page cache instead of holding its own copy.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.num_bits, self.num_hashes = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a bloom filter file")
+
+    def contains_digest(self, digest: bytes) -> bool:
+        buffer, offset = self._buffer, HEADER.size
+        return all(
+            buffer[offset + index // 8] & (1 << index % 8)
+            for index in bit_indexes(digest, self.num_bits, self.num_hashes)
+        )
+
+    def __contains__(self, password: str) -> bool:
+        return self.contains_digest(password_digest(password))
+
+
+def build_bloom_filter(
+    path: str, digests: Iterable[bytes], capacity: int, false_positive_rate: float
+) -> int:
+    """
+    Writes a Bloom filter of the given SHA-1 digests to path.
+
+    The filter is sized for capacity entries at false_positive_rate.
+    Returns the number of digests added.
+    """
+    num_bits, num_hashes = optimal_parameters(capacity, false_positive_rate)
+    bits = bytearray(ceil(num_bits / 8))
+    count = 0
+    for digest in digests:
+        for index in bit_indexes(digest, num_bits, num_hashes):
+            bits[index // 8] |= 1 << index % 8
+        count += 1
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, num_bits, num_hashes))
+        file.write(bits)
+    return count
+
+
+@lru_cache
+def load_bloom_filter(path: str) -> BloomFilter:
+    """Returns the filter at path, mapped once per process."""
+    return BloomFilter(path)
@@ -1,9 +1,63 @@
-# Cache keys are asscreated in the format: cache-api-{user_token}-{path_key}
-# where path_key is defined below for paths that need to be invalidated
-# separately from others. if a request does not have a user token,
-# the cache key will be: cache-api-0-{path_key} for example: meta api's cacjhe key
-# will be cache-api-0-0
+# API responses are cached under API_CACHE_KEY where namespace is defined
+# below for paths that need to be invalidated separately from others and
+# version is the namespace's current version, see
+# root.utils.utils.bump_cache_namespace_version. If a request does not have
+# a user token, token is 0, for example meta api's cache key will be
+# cache-api-meta-v{version}-0
 
 KEYS = {
-    "/meta": 0
-}
\ No newline at end of file
+    "/meta": "meta"
+}
+
+API_CACHE_KEY = "cache-api-{namespace}-v{version}-{token}"
+CACHE_NAMESPACE_VERSION_KEY = "cache-namespace-{namespace}"
+# Last stored response of a namespace regardless of its version, served
+# while the current version is rebuilt, and the lock held by the rebuilding
+# request, see root.utils.response_cache.get_cached_response_or_lock
+API_STALE_CACHE_KEY = "cache-api-{namespace}-stale-{token}"
+API_CACHE_LOCK_KEY = "lock-{cache_key}"
+
+# Per user cached responses, see root.utils.response_cache.cache_per_user.
+# data_version is the version of the user's USER_DATA_NAMESPACE, bumped on
+# every write to data owned by the user.
+USER_API_CACHE_KEY = (
+    "cache-api-{namespace}-v{version}-user-{user_id}-d{data_version}-{request_hash}"
+)
+USER_DATA_NAMESPACE = "user-{user_id}"
+
+# Cached auth tokens, see root.utils.token_cache
+AUTH_TOKEN_CACHE_KEY = "auth-token-{key}"
+AUTH_TOKEN_USER_CACHE_KEY = "auth-token-user-{user_id}"
+
+# Revoked signed access tokens, see root.utils.signed_tokens
+SIGNED_TOKEN_REVOKED_CACHE_KEY = "auth-signed-revoked-{jti}"
+# Time before which every signed token of a user is revoked, set on
+# password changes and deactivation
+SIGNED_TOKEN_USER_REVOKED_CACHE_KEY = "auth-signed-revoked-user-{user_id}"
+
+# Near static rows cached in process and in the shared cache, see
+# root.utils.tiered_cache
+TIERED_CACHE_KEY = "cache-tiered-{namespace}-v{version}"
+APP_SETTINGS_NAMESPACE = "app-settings"
+MODULE_INFO_NAMESPACE = "module-info"
+
+# OTPs of main.otp_backends.CacheOTPBackend
+OTP_CODE_CACHE_KEY = "otp-code-{user_id}-{otp_type}-g{generation}-{otp_hash}"
+OTP_ATTEMPT_CACHE_KEY = "otp-attempt-{user_id}-{otp_type}"
+OTP_GENERATION_CACHE_KEY = "otp-generation-{user_id}-{otp_type}"
+
+# Sliding window of OTP emails requested, see main.utils.check_otp_rate_limit
+OTP_RATE_LIMIT_KEY = "rate-limit-otp-{otp_type}-{email}"
+
+# Redis list of emails waiting to be sent, see root.utils.mail.queue_email
+MAIL_OUTBOX_KEY = "mail-outbox"
+# Emails taken from the outbox by the running delivery, removed once sent
+# or dead lettered. Left over entries are put back by the next run.
+MAIL_PROCESSING_KEY = "mail-processing"
+# Held by the running delivery, see main.tasks.deliver_queued_emails
+MAIL_DELIVERY_LOCK_KEY = "lock-mail-delivery"
+# Sorted set of emails deferred after a temporary failure, scored by the
+# unix time they may be retried at
+MAIL_DEFERRED_KEY = "mail-deferred"
+# Emails dropped after a permanent failure, kept for inspection
+MAIL_DEAD_LETTER_KEY = "mail-dead-letter"
@@ -0,0 +1,58 @@
+from re import compile
+from time import perf_counter
+
+from django.template.loader import render_to_string
+from django.utils.html import escape
+
+from root.utils.metrics import HitMissCounter, TimingMetric
+from root.utils.tiered_cache import LocalLRUCache
+
+email_template_counter = HitMissCounter("email_template_cache")
+email_render_time = TimingMetric("email_render_time")
+
+PLACEHOLDER = "__email_field_{name}__"
+PLACEHOLDER_PATTERN = compile(r"__email_field_([\w.]+)__")
+
+# Rendered templates with placeholders, keyed by template name and context
+prerendered_templates = LocalLRUCache(64)
+
+
+def build_placeholder_context(fields: dict) -> dict:
+    """Maps dotted field names, like user.first_name, to nested dicts holding their placeholders."""
+    context = {}
+    for name in fields:
+        *parents, leaf = name.split(".")
+        node = context
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[leaf] = PLACEHOLDER.format(name=name)
+    return context
+
+
+def render_email(template_name: str, context: dict, fields: dict) -> str:
+    """
+    Renders an email template with context and the per recipient fields.
+
+    Each process renders a template once per context, with placeholders in
+    place of fields, and later calls only substitute the HTML escaped
+    field values. Context values must be hashable, and fields must be
+    output as plain variables, without filters or tags using them.
+    """
+    started_at = perf_counter()
+    key = (template_name, *sorted(context.items()))
+    if (entry := prerendered_templates.get(key)) is not None:
+        email_template_counter.hit()
+        body = entry[0]
+    else:
+        email_template_counter.miss()
+        body = render_to_string(
+            template_name, {**context, **build_placeholder_context(fields)}
+        )
+        prerendered_templates.set(key, body, 0, float("inf"))
+    values = {name: escape(value) for name, value in fields.items()}
+    # One pass, so field values are never searched for placeholders
+    body = PLACEHOLDER_PATTERN.sub(
+        lambda match: values.get(match[1], match[0]), body
+    )
+    email_render_time.observe(perf_counter() - started_at)
+    return body
@@ -1 +1,2 @@
 EMAIL_NOT_VERIFIED = "email_not_verified"
+PASSWORD_HASHING_BUSY = "password_hashing_busy"
@@ -0,0 +1,39 @@
+from decimal import Decimal
+
+from django.conf import settings
+from rest_framework import serializers
+
+# Digits of the largest amount a BigIntegerField of minor units holds
+MONEY_MAX_DIGITS = 18
+
+
+def to_minor_units(value) -> int:
+    """Converts an amount in major units, like Decimal("10.25"), to minor units."""
+    return int(Decimal(value).scaleb(settings.MONEY_SCALE))
+
+
+def to_major_units(value: int) -> Decimal:
+    """Converts an amount in minor units, like 1025, to major units."""
+    return Decimal(value).scaleb(-settings.MONEY_SCALE)
+
+
+class MoneyField(serializers.DecimalField):
+    """
+    Amount in major units in requests and responses, stored as an integer
+    count of minor units.
+
+    Input with more than MONEY_SCALE decimal places is rejected rather
+    than rounded. Amounts are rendered as JSON numbers.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("max_digits", MONEY_MAX_DIGITS)
+        kwargs.setdefault("decimal_places", settings.MONEY_SCALE)
+        kwargs.setdefault("coerce_to_string", False)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data) -> int:
+        return to_minor_units(super().to_internal_value(data))
+
+    def to_representation(self, value: int) -> Decimal:
+        return super().to_representation(to_major_units(value))
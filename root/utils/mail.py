@@ -0,0 +1,225 @@
+import json
+import logging
+from smtplib import (SMTPException, SMTPRecipientsRefused,
+                     SMTPResponseException, SMTPServerDisconnected)
+from secrets import token_hex
+from threading import Lock
+from time import monotonic, time
+
+from celery.signals import worker_process_init, worker_process_shutdown
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.smtp import EmailBackend as SMTPEmailBackend
+from django_redis import get_redis_connection
+
+from root.utils.constants.cache_keys import (MAIL_DEAD_LETTER_KEY,
+                                             MAIL_DEFERRED_KEY,
+                                             MAIL_OUTBOX_KEY,
+                                             MAIL_PROCESSING_KEY)
+
+logger = logging.getLogger(__name__)
+
+
+class PooledMailConnection:
+    """
+    Mail backend connection kept open between sends, one per process.
+
+    Before a send on an SMTP connection idle for EMAIL_KEEPALIVE_INTERVAL
+    seconds or more, a NOOP checks that the server did not drop it. A
+    connection found dead, or dropped during the send, is replaced and the
+    send is retried once.
+    """
+
+    def __init__(self):
+        self._connection = None
+        self._last_used = 0.0
+        self._lock = Lock()
+
+    def _is_alive(self) -> bool:
+        if self._connection is None:
+            return False
+        if not isinstance(self._connection, SMTPEmailBackend):
+            return True
+        if self._connection.connection is None:
+            return False
+        if monotonic() - self._last_used < settings.EMAIL_KEEPALIVE_INTERVAL:
+            return True
+        try:
+            return self._connection.connection.noop()[0] == 250
+        except (SMTPException, OSError):
+            return False
+
+    def _reopen(self) -> None:
+        self.close()
+        self._connection = get_connection(fail_silently=False)
+        self._connection.open()
+
+    def send_messages(self, messages: list) -> int:
+        with self._lock:
+            if not self._is_alive():
+                self._reopen()
+            try:
+                sent = self._connection.send_messages(messages)
+            except (SMTPServerDisconnected, ConnectionError):
+                logger.warning("Mail connection dropped, reconnecting")
+                self._reopen()
+                sent = self._connection.send_messages(messages)
+            self._last_used = monotonic()
+            return sent or 0
+
+    def close(self) -> None:
+        if self._connection is None:
+            return
+        try:
+            self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
+
+    def discard(self) -> None:
+        """Forgets the connection without closing it, for a forked child whose socket belongs to the parent."""
+        self._connection = None
+
+
+mail_connection = PooledMailConnection()
+
+
+@worker_process_init.connect
+def reset_mail_connection(**kwargs):
+    mail_connection.discard()
+
+
+@worker_process_shutdown.connect
+def close_mail_connection(**kwargs):
+    mail_connection.close()
+
+
+def queue_email(
+    subject: str, html_message: str, recipient_list: list,
+    message: str = "", from_email: str | None = None
+) -> None:
+    """Adds an email to the outbox delivered by main.tasks.deliver_queued_emails."""
+    get_redis_connection("default").rpush(MAIL_OUTBOX_KEY, json.dumps({
+        # Keeps identical emails apart in the deferred sorted set
+        "id": token_hex(8),
+        "subject": subject,
+        "message": message,
+        "html_message": html_message,
+        "from_email": from_email,
+        "recipient_list": recipient_list
+    }))
+
+
+def build_email(payload: bytes) -> EmailMultiAlternatives:
+    data = json.loads(payload)
+    email = EmailMultiAlternatives(
+        data["subject"], data["message"], data["from_email"], data["recipient_list"]
+    )
+    if data["html_message"]:
+        email.attach_alternative(data["html_message"], "text/html")
+    return email
+
+
+def is_permanent_failure(exc: Exception) -> bool:
+    """Whether the server rejected the email with a 5xx reply, so resending cannot succeed."""
+    if isinstance(exc, SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, SMTPResponseException):
+        return exc.smtp_code >= 500
+    return False
+
+
+def dead_letter_email(redis, payload: bytes, exc: Exception) -> None:
+    data = json.loads(payload)
+    logger.error(
+        "Dropped email %r to %s: %s", data["subject"], data["recipient_list"], exc
+    )
+    redis.rpush(MAIL_DEAD_LETTER_KEY, json.dumps({**data, "error": str(exc)}))
+    redis.ltrim(MAIL_DEAD_LETTER_KEY, -settings.EMAIL_DEAD_LETTER_SIZE, -1)
+
+
+def defer_email(redis, payload: bytes, exc: Exception) -> None:
+    """
+    Schedules a retry after EMAIL_RETRY_DELAY seconds, doubled on every
+    attempt, or dead letters the email after EMAIL_MAX_DELIVERY_ATTEMPTS.
+    """
+    data = json.loads(payload)
+    data["attempts"] = data.get("attempts", 0) + 1
+    if data["attempts"] >= settings.EMAIL_MAX_DELIVERY_ATTEMPTS:
+        dead_letter_email(redis, payload, exc)
+        return
+    logger.warning(
+        "Deferred email %r to %s: %s", data["subject"], data["recipient_list"], exc
+    )
+    retry_at = time() + settings.EMAIL_RETRY_DELAY * 2 ** (data["attempts"] - 1)
+    redis.zadd(MAIL_DEFERRED_KEY, {json.dumps(data): retry_at})
+
+
+def requeue_deferred_emails() -> int:
+    """
+    Moves the deferred emails whose retry time has passed to the end of the outbox.
+
+    Returns:
+        int: Number of emails requeued.
+    """
+    redis = get_redis_connection("default")
+    payloads = redis.zrangebyscore(MAIL_DEFERRED_KEY, "-inf", time())
+    if payloads:
+        with redis.pipeline() as pipe:
+            pipe.zrem(MAIL_DEFERRED_KEY, *payloads)
+            pipe.rpush(MAIL_OUTBOX_KEY, *payloads)
+            pipe.execute()
+    return len(payloads)
+
+
+def restore_processing_emails() -> int:
+    """
+    Puts the emails left in processing by an interrupted delivery back at
+    the head of the outbox, in their original order.
+
+    Returns:
+        int: Number of emails restored.
+    """
+    redis = get_redis_connection("default")
+    restored = 0
+    while redis.lmove(MAIL_PROCESSING_KEY, MAIL_OUTBOX_KEY, "RIGHT", "LEFT"):
+        restored += 1
+    if restored:
+        logger.warning("Restored %d emails of an interrupted delivery", restored)
+    return restored
+
+
+def deliver_email_batch(batch_size: int) -> int:
+    """
+    Sends up to batch_size queued emails over the pooled connection, one
+    message at a time, so a rejected email does not fail the others.
+
+    The batch is moved to a processing list first and each email is removed
+    from it only once sent, dead lettered or deferred, so the emails of a
+    worker killed mid batch are restored by the next run. Emails rejected
+    with a 5xx reply are dead lettered, emails hitting another SMTP error
+    are deferred, see defer_email. Any other error is raised, leaving the
+    unsent emails in processing.
+
+    Returns:
+        int: Number of emails taken from the outbox, 0 once it is empty.
+    """
+    redis = get_redis_connection("default")
+    with redis.pipeline() as pipe:
+        for _ in range(batch_size):
+            pipe.lmove(MAIL_OUTBOX_KEY, MAIL_PROCESSING_KEY, "LEFT", "RIGHT")
+        payloads = [payload for payload in pipe.execute() if payload is not None]
+    for payload in payloads:
+        failure = None
+        try:
+            mail_connection.send_messages([build_email(payload)])
+        except (SMTPRecipientsRefused, SMTPResponseException) as exc:
+            failure = exc
+        with redis.pipeline() as pipe:
+            if failure is not None and is_permanent_failure(failure):
+                dead_letter_email(pipe, payload, failure)
+            elif failure is not None:
+                defer_email(pipe, payload, failure)
+            pipe.lrem(MAIL_PROCESSING_KEY, 1, payload)
+            pipe.execute()
+    return len(payloads)
@@ -0,0 +1,87 @@
+from threading import Lock
+
+# Every metric registers itself here so all of them can be listed from one place
+REGISTRY = {}
+
+
+class HitMissCounter:
+    """
+    Thread safe, process local hit/miss counter for cache layers.
+
+    Counters are kept per worker process, so the values reported describe
+    the process serving the request that reads them.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        REGISTRY[name] = self
+
+    def hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4)
+        }
+
+
+def get_metrics() -> dict:
+    """Returns a snapshot of every registered metric keyed by its name."""
+    return {name: metric.snapshot() for name, metric in REGISTRY.items()}
+
+
+class TimingMetric:
+    """
+    Thread safe, process local summary of durations in seconds.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = Lock()
+        REGISTRY[name] = self
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def reset(self) -> None:
+        with self._lock:
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "average_ms": round(self.average * 1000, 3),
+            "max_ms": round(self.max * 1000, 3)
+        }
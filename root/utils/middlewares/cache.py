@@ -1,11 +1,10 @@
-import json
-
-from django.contrib.auth.models import AnonymousUser
-from django.core.cache import cache
-from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 
-from root.utils.constants.cache_keys import KEYS
+from root.utils.constants.cache_keys import (API_CACHE_KEY,
+                                             API_STALE_CACHE_KEY, KEYS)
+from root.utils.response_cache import (get_cached_response_or_lock,
+                                       release_cache_lock, set_cached_response)
+from root.utils.utils import get_cache_namespace_version
 
 
 class CacheFetchMiddleware(MiddlewareMixin):
@@ -26,12 +25,21 @@ class CacheFetchMiddleware(MiddlewareMixin):
                 token = authorization.split(" ")[1]
             else:
                 token = "0"
-            cache_key = f"cache-api-{token}-{KEYS[request.path]}"
-            cached_response = cache.get(cache_key)
-
-            if cached_response:
-                # Rebuild HttpResponse object from cache
-                return JsonResponse(json.loads(cached_response), safe=False)
+            namespace = KEYS[request.path]
+            cache_key = API_CACHE_KEY.format(
+                namespace=namespace,
+                version=get_cache_namespace_version(namespace),
+                token=token
+            )
+            # Stored by CacheStoreMiddleware under the version read here, so an
+            # invalidation during the request cannot be overwritten by old data
+            request.api_cache_key = cache_key
+            request.api_stale_cache_key = API_STALE_CACHE_KEY.format(
+                namespace=namespace, token=token
+            )
+            return get_cached_response_or_lock(
+                cache_key, request.api_stale_cache_key, request
+            )
 
         return None
 
@@ -45,19 +53,12 @@ class CacheStoreMiddleware(MiddlewareMixin):
     def process_response(self, request, response):
         # Only cache GET responses with 200 status
         if request.method == "GET" and response.status_code == 200:
-            if not request.path in KEYS:
-                return response
-            if isinstance(request.user, AnonymousUser):
-                user_token = "0"
-            else:
-                user_token = str(request.user.auth_token.key)
-            cache_key = f"cache-api-{user_token}-{KEYS[request.path]}"
-            # Convert JsonResponse to JSON string
-            try:
-                content = response.content.decode()
-                # cache permanently
-                cache.set(cache_key, content, timeout=None)
-            except Exception as e:
-                print(f"[CacheStoreMiddleware] Failed to cache response: {e}")
+            if cache_key := getattr(request, "api_cache_key", None):
+                set_cached_response(
+                    cache_key, response,
+                    stale_cache_key=getattr(request, "api_stale_cache_key", None)
+                )
 
+        # Released for failed responses too so waiting requests stop waiting
+        release_cache_lock(request)
         return response
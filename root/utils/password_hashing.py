@@ -0,0 +1,102 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from time import perf_counter
+from typing import Any, Callable
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+from rest_framework.exceptions import APIException
+
+from root.utils.error_codes import PASSWORD_HASHING_BUSY
+from root.utils.metrics import TimingMetric
+
+hash_latency = TimingMetric("password_hashing_latency")
+hash_queue_wait = TimingMetric("password_hashing_queue_wait")
+
+
+class PasswordHashingBusy(APIException):
+    status_code = 503
+    default_detail = "Server is busy, please try again later."
+    default_code = PASSWORD_HASHING_BUSY
+
+
+class PasswordHashingPool:
+    """
+    Size limited thread pool that runs password hashing off the request worker.
+
+    At most `workers` hashes run at once and at most `max_queue` more wait
+    for a thread. Further submissions fail immediately with
+    PasswordHashingBusy, so a burst of logins is answered with 503s rather
+    than tying up every worker of the server.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hashing"
+        )
+        self._slots = BoundedSemaphore(workers + max_queue)
+
+    def submit(self, fn: Callable, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        submitted_at = perf_counter()
+
+        def timed():
+            started_at = perf_counter()
+            hash_queue_wait.observe(started_at - submitted_at)
+            try:
+                return fn(*args)
+            finally:
+                hash_latency.observe(perf_counter() - started_at)
+
+        try:
+            future = self._executor.submit(timed)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda future: self._slots.release())
+        return future
+
+    def run(self, fn: Callable, *args) -> Any:
+        """Runs fn in the pool, blocking the calling thread until it returns."""
+        return self.submit(fn, *args).result()
+
+    async def arun(self, fn: Callable, *args) -> Any:
+        """Runs fn in the pool without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+
+_pool = None
+_pool_lock = Lock()
+
+
+def get_password_hashing_pool() -> PasswordHashingPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PasswordHashingPool(
+                    settings.PASSWORD_HASHING_WORKERS,
+                    settings.PASSWORD_HASHING_QUEUE_SIZE
+                )
+    return _pool
+
+
+def hash_password(raw_password: str | None) -> str:
+    return get_password_hashing_pool().run(make_password, raw_password)
+
+
+def check_password_hash(raw_password: str | None, encoded: str) -> tuple[bool, bool]:
+    """Returns whether the password matches and whether its hash must be updated."""
+    return get_password_hashing_pool().run(verify_password, raw_password, encoded)
+
+
+async def ahash_password(raw_password: str | None) -> str:
+    return await get_password_hashing_pool().arun(make_password, raw_password)
+
+
+async def acheck_password_hash(raw_password: str | None, encoded: str) -> tuple[bool, bool]:
+    return await get_password_hashing_pool().arun(
+        verify_password, raw_password, encoded
+    )
@@ -1,13 +1,16 @@
-from re import search
+from re import compile
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
-REGEX_PATTERNS = {
+from root.utils.bloom_filter import load_bloom_filter
+
+REGEX_PATTERNS = (
     ("[A-Z]+", "Atleast One upper case character required"),
     ("[a-z]+", "Atleast One lower case character required"),
     ("[0-9]+", "Atleast One numeric character required"),
     (r"^\S+$", "White Spaces not allowed")
-}
+)
 
 
 class PasswordRegexValidator:
@@ -15,21 +18,24 @@ class PasswordRegexValidator:
     PasswordRegexValidator validates a password against a set of regular expression patterns.
 
     Attributes:
-        patterns (list): A list of tuples where each tuple contains a regex pattern and an associated error message.
-        errors (list): A list to store error messages for failed validations.
+        patterns (tuple): Tuples of a compiled regex pattern and an associated error message.
 
     Methods:
         __init__(*args, **kwargs):
-            Initializes the validator with provided patterns or defaults to REGEX_PATTERNS.
+            Compiles the provided patterns or defaults to REGEX_PATTERNS.
 
         validate(password: str, user=None):
             Validates the given password against all patterns.
-            Appends error messages for each failed pattern.
-            Raises ValidationError with all collected errors if any pattern fails.
+            Raises ValidationError with the error message of every failed pattern.
+
+    The validator keeps no state between calls, so one instance can be
+    shared by every request, see main.validators.get_password_validators.
     """
     def __init__(self, *args, **kwargs):
-        self.patterns = kwargs.get("patterns", REGEX_PATTERNS)
-        self.errors = []
+        self.patterns = tuple(
+            (compile(pattern), message)
+            for pattern, message in kwargs.get("patterns", REGEX_PATTERNS)
+        )
 
     def validate(self, password: str, user=None):
         """
@@ -43,8 +49,32 @@ class PasswordRegexValidator:
             ValidationError: If the password does not match one or more patterns,
             with a list of error messages describing the failed validations.
         """
-        for pattern in self.patterns:
-            if not search(pattern[0], password):
-                self.errors.append(pattern[1])
-        if self.errors:
-            raise ValidationError(self.errors)
+        errors = [
+            message for pattern, message in self.patterns
+            if not pattern.search(password)
+        ]
+        if errors:
+            raise ValidationError(errors)
+
+
+class BreachedPasswordValidator:
+    """
+    BreachedPasswordValidator rejects passwords found in known data breaches.
+
+    Passwords are looked up in the Bloom filter at
+    BREACHED_PASSWORD_FILTER_PATH, built with the
+    build_breached_password_filter command. A false positive rejects a
+    password that was never breached, at the rate the filter was built for.
+    Validation is skipped when no filter is configured.
+    """
+    message = "This password has appeared in a data breach and cannot be used"
+
+    def validate(self, password: str, user=None):
+        """
+        Raises:
+            ValidationError: If the password is in the breached password filter.
+        """
+        if not (path := settings.BREACHED_PASSWORD_FILTER_PATH):
+            return
+        if password in load_bloom_filter(path):
+            raise ValidationError(self.message)
@@ -0,0 +1,46 @@
+from datetime import timedelta
+from functools import cache
+from secrets import token_hex
+from time import time
+
+from django_redis import get_redis_connection
+
+# Sliding window log kept in a sorted set scored by request time in
+# milliseconds. Pruning, counting and recording the request run as one
+# script, so concurrent requests cannot exceed the limit and each check is
+# a single round trip. Returns 0 when the request is allowed, else the
+# milliseconds until the oldest request in the window leaves it.
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", now - window)
+if redis.call("ZCARD", KEYS[1]) >= limit then
+    local oldest = redis.call("ZRANGE", KEYS[1], 0, 0, "WITHSCORES")
+    return math.max(1, tonumber(oldest[2]) + window - now)
+end
+redis.call("ZADD", KEYS[1], now, ARGV[4])
+redis.call("PEXPIRE", KEYS[1], window)
+return 0
+"""
+
+
+@cache
+def get_sliding_window_script():
+    return get_redis_connection("default").register_script(SLIDING_WINDOW_SCRIPT)
+
+
+def hit_rate_limit(key: str, limit: int, window: timedelta) -> float | None:
+    """
+    Records a request under key unless limit requests were already recorded within window.
+
+    Returns:
+        float | None: None if the request is allowed, else the seconds
+        until it would be.
+    """
+    now = int(time() * 1000)
+    retry_after = get_sliding_window_script()(
+        keys=[key],
+        args=[now, int(window.total_seconds() * 1000), limit, f"{now}-{token_hex(4)}"]
+    )
+    return retry_after / 1000 if retry_after else None
@@ -1,5 +1,9 @@
-from rest_framework.response import Response
+from hashlib import md5
+
+from django.utils.http import quote_etag
 from rest_framework.renderers import JSONRenderer as Renderer
+from rest_framework.request import Request
+from rest_framework.response import Response
 
 from root.utils.base import success
 
@@ -11,7 +15,8 @@ class JSONRenderer(Renderer):
 
     This renderer wraps the provided data using the `success`
     function before rendering, ensuring that all responses follow
-    a consistent success structure.
+    a consistent success structure. Successful GET responses also get a
+    strong ETag computed from the rendered bytes.
 
     Methods:
         render(data, accepted_media_type=None, renderer_context=None):
@@ -19,7 +24,8 @@ class JSONRenderer(Renderer):
 
     def render(self, data, accepted_media_type=None, renderer_context=None):
         """
-        Renders the given data after wrapping it with a success response structure.
+        Renders the given data after wrapping it with a success response structure
+        and sets the ETag header of successful GET responses.
 
         Args:
             data (any): The data to be rendered.
@@ -32,4 +38,16 @@ class JSONRenderer(Renderer):
         response: Response = renderer_context.get("response", None)
         if response and response.status_code in range(200, 300):
             data = success(data)
-        return super().render(data, accepted_media_type, renderer_context)
+        rendered = super().render(data, accepted_media_type, renderer_context)
+        request: Request = renderer_context.get("request", None)
+        if (
+            response and request and request.method in ("GET", "HEAD") and
+            response.status_code in range(200, 300) and
+            not response.has_header("ETag")
+        ):
+            # Strong ETag of the exact bytes sent, compared against
+            # If-None-Match by ConditionalGetMiddleware
+            response["ETag"] = quote_etag(
+                md5(rendered, usedforsecurity=False).hexdigest()
+            )
+        return rendered
@@ -0,0 +1,189 @@
+import logging
+from functools import wraps
+from hashlib import md5
+from time import monotonic, sleep
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework.request import Request
+
+from root.utils.constants.cache_keys import (API_CACHE_LOCK_KEY,
+                                             USER_API_CACHE_KEY,
+                                             USER_DATA_NAMESPACE)
+from root.utils.utils import (bump_cache_namespace_version,
+                              get_cache_namespace_versions)
+
+logger = logging.getLogger(__name__)
+
+# Headers replayed on a cache hit
+CACHED_RESPONSE_HEADERS = (
+    "Content-Type", "Content-Language", "Vary", "Allow", "ETag"
+)
+# Seconds between checks for a response rebuilt by another request
+LOCK_POLL_INTERVAL = 0.05
+
+
+def build_cached_response(cached_response: dict, request: HttpRequest) -> HttpResponse:
+    """
+    Builds a response from an entry stored by set_cached_response.
+
+    The stored bytes are served as they are, without parsing or rendering.
+    If the request's If-None-Match matches the stored ETag, an empty 304
+    response is returned instead.
+    """
+    etag = cached_response["headers"].get("ETag")
+    if etag and (not_modified := get_conditional_response(request, etag=etag)):
+        return not_modified
+    response = HttpResponse(
+        cached_response["content"], status=cached_response["status"]
+    )
+    for header, value in cached_response["headers"].items():
+        response[header] = value
+    return response
+
+
+def get_cached_response(cache_key: str, request: HttpRequest) -> HttpResponse | None:
+    """Returns a response stored by set_cached_response, None on a cache miss."""
+    cached_response = cache.get(cache_key)
+    if cached_response is None:
+        return None
+    return build_cached_response(cached_response, request)
+
+
+def get_cached_response_or_lock(
+    cache_key: str, stale_cache_key: str, request: HttpRequest
+) -> HttpResponse | None:
+    """
+    Single flight variant of get_cached_response for shared cache entries.
+
+    On a miss only the request that acquires the rebuild lock gets None and
+    sets request.api_cache_lock_key; it must rebuild the response and store
+    it with set_cached_response, which releases the lock. Concurrent
+    requests are served the last stored copy from stale_cache_key if there
+    is one, otherwise they wait up to API_CACHE_LOCK_WAIT seconds for the
+    rebuilt response and only then rebuild it themselves.
+    """
+    cached = cache.get_many([cache_key, stale_cache_key])
+    if cache_key in cached:
+        return build_cached_response(cached[cache_key], request)
+
+    lock_key = API_CACHE_LOCK_KEY.format(cache_key=cache_key)
+    # The lock expires by itself if its holder dies before releasing it
+    if cache.add(lock_key, 1, timeout=settings.API_CACHE_LOCK_TIMEOUT):
+        request.api_cache_lock_key = lock_key
+        return None
+
+    if stale_cache_key in cached:
+        return build_cached_response(cached[stale_cache_key], request)
+
+    deadline = monotonic() + settings.API_CACHE_LOCK_WAIT
+    while monotonic() < deadline:
+        sleep(LOCK_POLL_INTERVAL)
+        if (cached_response := cache.get(cache_key)) is not None:
+            return build_cached_response(cached_response, request)
+    return None
+
+
+def set_cached_response(
+    cache_key: str, response: HttpResponse, stale_cache_key: str | None = None
+) -> None:
+    """
+    Stores the rendered bytes of a response with the headers in CACHED_RESPONSE_HEADERS.
+
+    If stale_cache_key is given the response is also kept there for
+    API_CACHE_STALE_TIMEOUT seconds, to be served by
+    get_cached_response_or_lock while the next version is rebuilt.
+    Responses larger than API_CACHE_MAX_SIZE bytes are not cached.
+    """
+    if response.streaming or len(response.content) > settings.API_CACHE_MAX_SIZE:
+        return
+    cached_response = {
+        "content": response.content,
+        "status": response.status_code,
+        "headers": {
+            header: response[header]
+            for header in CACHED_RESPONSE_HEADERS if header in response
+        }
+    }
+    try:
+        # Entries of older namespace versions expire through the timeout
+        cache.set(cache_key, cached_response, timeout=settings.API_CACHE_TIMEOUT)
+        if stale_cache_key:
+            cache.set(
+                stale_cache_key, cached_response,
+                timeout=settings.API_CACHE_STALE_TIMEOUT
+            )
+    except Exception as e:
+        logger.warning("Failed to cache response: %s", e)
+
+
+def release_cache_lock(request: HttpRequest) -> None:
+    """Releases the rebuild lock acquired by get_cached_response_or_lock, if any."""
+    if lock_key := getattr(request, "api_cache_lock_key", None):
+        cache.delete(lock_key)
+        del request.api_cache_lock_key
+
+
+def bump_user_data_version(user_id: int) -> int:
+    """Invalidates every per user cached response of a user."""
+    return bump_cache_namespace_version(
+        USER_DATA_NAMESPACE.format(user_id=user_id)
+    )
+
+
+def get_user_api_cache_key(namespace: str, request: Request) -> str:
+    """
+    Builds the cache key of a response for the requesting user.
+
+    The key is built from the user id rather than the token, so every
+    device of a user shares entries, and embeds both the namespace version
+    and the user's data version.
+    """
+    user_id = request.user.pk
+    version, data_version = get_cache_namespace_versions(
+        namespace, USER_DATA_NAMESPACE.format(user_id=user_id)
+    )
+    query_string = urlencode(sorted(request.query_params.lists()), doseq=True)
+    request_hash = md5(
+        f"{request.path}?{query_string}".encode(), usedforsecurity=False
+    ).hexdigest()
+    return USER_API_CACHE_KEY.format(
+        namespace=namespace, version=version, user_id=user_id,
+        data_version=data_version, request_hash=request_hash
+    )
+
+
+def cache_per_user(namespace: str):
+    """
+    Caches successful GET responses of a view per user and query string.
+
+    Meant for DRF handlers, which run after authentication and permission
+    checks, for example:
+
+        @method_decorator(cache_per_user("contacts"), name="list")
+        class ContactsViewSet(ModelViewSet):
+            ...
+
+    Entries are invalidated by bump_user_data_version, which the signals
+    of the cached models call on every write.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request: Request, *args, **kwargs):
+            if request.method != "GET":
+                return view_func(request, *args, **kwargs)
+            cache_key = get_user_api_cache_key(namespace, request)
+            if (cached_response := get_cached_response(cache_key, request)) is not None:
+                return cached_response
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200:
+                # Content is only available once the response is rendered
+                response.add_post_render_callback(
+                    lambda rendered: set_cached_response(cache_key, rendered)
+                )
+            return response
+        return _wrapped_view
+    return decorator
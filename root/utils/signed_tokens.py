@@ -0,0 +1,133 @@
+from secrets import token_hex
+from time import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from root.utils.constants.cache_keys import (SIGNED_TOKEN_REVOKED_CACHE_KEY,
+                                             SIGNED_TOKEN_USER_REVOKED_CACHE_KEY)
+from root.utils.utils import build_user_from_values
+
+SIGNED_TOKEN_SALT = "root.utils.signed_tokens"
+
+
+class SignedToken:
+    """
+    Verified claims of a signed access token, set as `request.auth`.
+
+    Attributes:
+        key (str): The signed token string sent by the client.
+        user_id (int): ID of the user the token was issued to.
+        username (str): Username of the user the token was issued to.
+        expires_at (int): Expiry as a unix timestamp.
+        jti (str): Unique token id used for revocation.
+        issued_at (float): Issue time as a unix timestamp.
+    """
+
+    def __init__(
+        self, key: str, user_id: int, username: str, expires_at: int, jti: str,
+        issued_at: float
+    ):
+        self.key = key
+        self.user_id = user_id
+        self.username = username
+        self.expires_at = expires_at
+        self.jti = jti
+        self.issued_at = issued_at
+
+    @property
+    def is_expired(self) -> bool:
+        return time() > self.expires_at
+
+    @property
+    def user(self):
+        # Tokens are only issued to active users with a verified email,
+        # see LoginAPIView, and deactivation revokes them, see
+        # revoke_user_signed_tokens, so those fields do not need a query either.
+        return build_user_from_values({
+            "id": self.user_id,
+            "username": self.username,
+            "is_active": True,
+            "email_verified": True
+        })
+
+    def delete(self) -> None:
+        """Revokes the token, mirroring Token.delete() for logout."""
+        revoke_signed_token(self)
+
+    def __str__(self) -> str:
+        return self.key
+
+
+def issue_signed_token(user) -> str:
+    """
+    Issues an HMAC signed token embedding the user id and expiry.
+
+    Args:
+        user (User): The user the token is issued to.
+
+    Returns:
+        str: The signed token valid for AUTH_TOKEN_EXPIRY.
+    """
+    issued_at = time()
+    claims = {
+        "uid": user.pk,
+        "usr": user.username,
+        "iat": issued_at,
+        "exp": int(issued_at + settings.AUTH_TOKEN_EXPIRY.total_seconds()),
+        "jti": token_hex(8)
+    }
+    return signing.dumps(claims, salt=SIGNED_TOKEN_SALT)
+
+
+def load_signed_token(key: str) -> SignedToken:
+    """
+    Verifies the signature of a token and returns its claims.
+
+    Raises:
+        signing.BadSignature: If the token was tampered with or not issued by us.
+    """
+    claims = signing.loads(key, salt=SIGNED_TOKEN_SALT)
+    # Tokens issued before the claim existed are dated from their expiry
+    issued_at = claims.get(
+        "iat", claims["exp"] - settings.AUTH_TOKEN_EXPIRY.total_seconds()
+    )
+    return SignedToken(
+        key, claims["uid"], claims["usr"], claims["exp"], claims["jti"],
+        issued_at
+    )
+
+
+def revoke_signed_token(token: SignedToken) -> None:
+    # The entry expires together with the token, so the list only ever
+    # holds tokens that would otherwise still be accepted.
+    timeout = int(token.expires_at - time())
+    if timeout > 0:
+        cache.set(
+            SIGNED_TOKEN_REVOKED_CACHE_KEY.format(jti=token.jti), 1,
+            timeout=timeout
+        )
+
+
+def revoke_user_signed_tokens(user_id: int) -> None:
+    """
+    Revokes every signed token issued to a user until now.
+
+    Kept for AUTH_TOKEN_EXPIRY, after which the revoked tokens have expired.
+    """
+    cache.set(
+        SIGNED_TOKEN_USER_REVOKED_CACHE_KEY.format(user_id=user_id), time(),
+        timeout=int(settings.AUTH_TOKEN_EXPIRY.total_seconds())
+    )
+
+
+def is_signed_token_revoked(token: SignedToken) -> bool:
+    """Checks the token and its user's revocations in one cache round trip."""
+    token_key = SIGNED_TOKEN_REVOKED_CACHE_KEY.format(jti=token.jti)
+    user_key = SIGNED_TOKEN_USER_REVOKED_CACHE_KEY.format(user_id=token.user_id)
+    revoked = cache.get_many([token_key, user_key])
+    if token_key in revoked:
+        return True
+    revoked_before = revoked.get(user_key)
+    return revoked_before is not None and token.issued_at <= revoked_before
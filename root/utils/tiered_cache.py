@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import cache
+
+from root.utils.constants.cache_keys import TIERED_CACHE_KEY
+from root.utils.metrics import HitMissCounter
+from root.utils.utils import (bump_cache_namespace_version,
+                              get_cache_namespace_version)
+
+local_cache_counter = HitMissCounter("tiered_cache_local")
+shared_cache_counter = HitMissCounter("tiered_cache_shared")
+
+
+class LocalLRUCache:
+    """
+    Thread safe, process local LRU cache whose entries expire after a TTL.
+
+    Entries are stored with the namespace version they were loaded under.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> tuple | None:
+        """Returns (value, version, expires_at) of key, None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Any, version: int, timeout: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, version, monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalLRUCache(settings.TIERED_CACHE_LOCAL_MAX_ENTRIES)
+
+
+def get_tiered(namespace: str, loader: Callable[[], Any]) -> Any:
+    """
+    Returns the value of a namespace from the local cache, then the shared
+    cache, calling loader and filling both tiers on a miss.
+
+    A local entry is served as is for TIERED_CACHE_LOCAL_TIMEOUT seconds.
+    After that its version is compared with the namespace version in the
+    shared cache, so invalidations made by other processes are picked up
+    within that many seconds at the cost of one read per timeout.
+    """
+    entry = local_cache.get(namespace)
+    if entry is not None and entry[2] > monotonic():
+        local_cache_counter.hit()
+        return entry[0]
+
+    version = get_cache_namespace_version(namespace)
+    if entry is not None and entry[1] == version:
+        local_cache_counter.hit()
+        local_cache.set(
+            namespace, entry[0], version, settings.TIERED_CACHE_LOCAL_TIMEOUT
+        )
+        return entry[0]
+    local_cache_counter.miss()
+
+    shared_key = TIERED_CACHE_KEY.format(namespace=namespace, version=version)
+    # Wrapped so a cached None is told apart from a miss
+    if (cached := cache.get(shared_key)) is not None:
+        shared_cache_counter.hit()
+        value = cached[0]
+    else:
+        shared_cache_counter.miss()
+        value = loader()
+        cache.set(
+            shared_key, (value,), timeout=settings.TIERED_CACHE_SHARED_TIMEOUT
+        )
+    local_cache.set(namespace, value, version, settings.TIERED_CACHE_LOCAL_TIMEOUT)
+    return value
+
+
+def invalidate_tiered(namespace: str) -> None:
+    """
+    Invalidates a namespace in this process and in the shared cache, other
+    processes drop their local copy on its next version check.
+    """
+    bump_cache_namespace_version(namespace)
+    local_cache.delete(namespace)
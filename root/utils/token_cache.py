@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from root.utils.constants.cache_keys import (AUTH_TOKEN_CACHE_KEY,
+                                             AUTH_TOKEN_USER_CACHE_KEY)
+from root.utils.metrics import HitMissCounter
+from root.utils.utils import build_user_from_values
+
+# User fields needed by authentication and permission checks. Anything else
+# is left deferred and loaded from the database only when accessed.
+CACHED_USER_FIELDS = (
+    "id", "username", "first_name", "last_name", "email",
+    "is_active", "is_staff", "is_superuser", "email_verified"
+)
+
+token_cache_counter = HitMissCounter("auth_token_cache")
+
+
+def get_cached_token(key: str) -> Token | None:
+    """
+    Rebuilds a token and its user from the cache without querying the database.
+
+    Args:
+        key (str): The token key sent by the client.
+
+    Returns:
+        Token | None: The token with its user attached, or None on a cache miss.
+    """
+    data = cache.get(AUTH_TOKEN_CACHE_KEY.format(key=key))
+    if data is None:
+        token_cache_counter.miss()
+        return None
+    token_cache_counter.hit()
+    user = build_user_from_values(data["user"])
+    token = Token.from_db(
+        Token.objects.db, ["key", "user_id", "created"],
+        [key, user.pk, data["created"]]
+    )
+    token.user = user
+    return token
+
+
+def cache_token(token: Token) -> None:
+    """
+    Stores a token and the user fields in CACHED_USER_FIELDS.
+
+    The entry never outlives the token, so an expired token always
+    falls back to the database.
+    """
+    expires_at = token.created + settings.AUTH_TOKEN_EXPIRY
+    remaining = (expires_at - timezone.now()).total_seconds()
+    timeout = min(settings.AUTH_TOKEN_CACHE_TIMEOUT, int(remaining))
+    if timeout <= 0:
+        return
+    data = {
+        "user": {name: getattr(token.user, name) for name in CACHED_USER_FIELDS},
+        "created": token.created
+    }
+    cache.set_many(
+        {
+            AUTH_TOKEN_CACHE_KEY.format(key=token.key): data,
+            AUTH_TOKEN_USER_CACHE_KEY.format(user_id=token.user_id): token.key
+        },
+        timeout=timeout
+    )
+
+
+def invalidate_token(key: str) -> None:
+    cache.delete(AUTH_TOKEN_CACHE_KEY.format(key=key))
+
+
+def invalidate_user_token(user_id: int) -> None:
+    """Drops the cached token of a user, if any, so user changes are picked up."""
+    user_key = AUTH_TOKEN_USER_CACHE_KEY.format(user_id=user_id)
+    if key := cache.get(user_key):
+        cache.delete_many([AUTH_TOKEN_CACHE_KEY.format(key=key), user_key])
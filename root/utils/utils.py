@@ -1,10 +1,18 @@
+import logging
 from datetime import datetime, timedelta, timezone
+from time import perf_counter
 
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.db.models import Q, QuerySet
 from django.utils.http import base36_to_int
 from django.utils.timezone import now
 
+from root.utils.constants.cache_keys import CACHE_NAMESPACE_VERSION_KEY
+
+logger = logging.getLogger(__name__)
+
 
 def is_token_expired(token, timeout_seconds=settings.PASSWORD_RESET_TIMEOUT) -> bool:
     """Check if token is expired by comparing embedded timestamp."""
@@ -18,17 +26,101 @@ def is_token_expired(token, timeout_seconds=settings.PASSWORD_RESET_TIMEOUT) ->
     return now() - ts_datetime > timedelta(seconds=timeout_seconds)
 
 
-def get_all_cache_keys(pattern: str = "*") -> list[str]:
-    """Retrieve all cache keys matching a given pattern."""
-    cache_keys = []
-    try:
-        cache_keys = cache.keys(pattern)
-    except Exception:
-        pass
-    return cache_keys
+def get_cache_namespace_version(namespace: str) -> int:
+    """Returns the current version of a cache namespace, 0 if never invalidated."""
+    return cache.get(CACHE_NAMESPACE_VERSION_KEY.format(namespace=namespace)) or 0
+
+
+def get_cache_namespace_versions(*namespaces: str) -> list[int]:
+    """Returns the versions of several namespaces with a single cache round trip."""
+    keys = [
+        CACHE_NAMESPACE_VERSION_KEY.format(namespace=namespace)
+        for namespace in namespaces
+    ]
+    versions = cache.get_many(keys)
+    return [versions.get(key, 0) for key in keys]
+
+
+def bump_cache_namespace_version(namespace: str) -> int:
+    """
+    Invalidates every cache entry of a namespace with a single atomic INCR.
+
+    Keys embed the namespace version, so entries written under older
+    versions are never read again and simply expire through their TTL.
+    """
+    key = CACHE_NAMESPACE_VERSION_KEY.format(namespace=namespace)
+    cache.add(key, 0, timeout=None)
+    return cache.incr(key)
 
 
 def clear_cache(keys: list[str]) -> None:
 
     for key in keys:
         cache.delete(key)
+
+
+def build_user_from_values(values: dict):
+    """
+    Builds a user instance from already known field values without a query.
+
+    Fields missing from values are left deferred, so they are loaded from
+    the database only if accessed, and save() writes back only loaded fields.
+    """
+    user_model = get_user_model()
+    # from_db expects values in concrete field order
+    field_names = [
+        field.attname for field in user_model._meta.concrete_fields
+        if field.attname in values
+    ]
+    return user_model.from_db(
+        user_model.objects.db, field_names,
+        [values[name] for name in field_names]
+    )
+
+
+def delete_in_batches(queryset: QuerySet, batch_size: int, order_field: str = "pk") -> int:
+    """
+    Deletes the rows matched by a queryset in bounded batches.
+
+    Rows are walked with a keyset cursor on (order_field, pk) so every batch
+    is a short indexed range scan and locks are only held for one batch.
+    Each delete re-applies the queryset filters, so rows that stopped
+    matching since they were selected are left alone.
+
+    Args:
+        queryset (QuerySet): Rows to delete.
+        batch_size (int): Maximum number of rows deleted per statement.
+        order_field (str): Indexed field used to walk the rows.
+
+    Returns:
+        int: The number of rows removed from the queryset's table.
+    """
+    model = queryset.model
+    ordering = ("pk",) if order_field == "pk" else (order_field, "pk")
+    total = 0
+    cursor = None
+    batch_number = 0
+    while True:
+        batch = queryset.order_by(*ordering)
+        if cursor is not None:
+            if order_field == "pk":
+                batch = batch.filter(pk__gt=cursor[0])
+            else:
+                batch = batch.filter(
+                    Q(**{f"{order_field}__gt": cursor[0]}) |
+                    Q(**{order_field: cursor[0], "pk__gt": cursor[1]})
+                )
+        rows = list(batch.values_list(*ordering)[:batch_size])
+        if not rows:
+            break
+        batch_number += 1
+        started_at = perf_counter()
+        _, deleted = queryset.filter(pk__in=[row[-1] for row in rows]).delete()
+        count = deleted.get(model._meta.label, 0)
+        total += count
+        logger.info(
+            f"Deleted {count} {model._meta.label} rows in batch {batch_number} "
+            f"in {perf_counter() - started_at:.3f}s"
+        )
+        cursor = rows[-1]
+    return total
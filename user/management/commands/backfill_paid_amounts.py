@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db.transaction import atomic
+
+from root.utils.response_cache import bump_user_data_version
+from user.models import Transactions
+
+
+class Command(BaseCommand):
+    help = (
+        'Set paid_amount of transactions to the sum of their repayments, in '
+        'batches of ascending id each committed on its own. An interrupted '
+        'run is resumed with --start-after set to the last id reported'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Transactions updated per statement'
+        )
+        parser.add_argument(
+            '--start-after', type=int, default=0,
+            help='Only backfill transactions with a greater id'
+        )
+
+    def handle(self, *args, **options):
+        last_id = options['start_after']
+        total = 0
+        while True:
+            ids = list(
+                Transactions.objects.filter(pk__gt=last_id)
+                .order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            transactions = Transactions.objects.filter(pk__in=ids)
+            with atomic():
+                total += transactions.refresh_paid_amounts()
+            # update() sends no signals, so cached responses are invalidated here
+            for owner_id in set(transactions.values_list('contact__owner_id', flat=True)):
+                bump_user_data_version(owner_id)
+            last_id = ids[-1]
+            self.stdout.write(f'Backfilled transactions up to id {last_id}')
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {total} transactions'))
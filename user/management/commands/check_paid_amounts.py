@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from root.utils.response_cache import bump_user_data_version
+from user.models import Transactions
+
+
+class Command(BaseCommand):
+    help = (
+        'Report transactions whose paid_amount differs from the sum of their '
+        'repayments, and fail unless --fix is given to correct them'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Set the paid_amount of inconsistent transactions to the sum of their repayments'
+        )
+
+    def handle(self, *args, **options):
+        inconsistent = list(
+            Transactions.objects.filter_inconsistent_paid_amounts()
+            .order_by('pk').values_list('pk', 'contact__owner_id', 'paid_amount', 'repaid_amount')
+        )
+        for pk, _, paid_amount, repaid_amount in inconsistent:
+            self.stdout.write(
+                f'Transaction {pk}: paid_amount {paid_amount}, repayments total {repaid_amount}'
+            )
+        if not inconsistent:
+            self.stdout.write(self.style.SUCCESS('All paid amounts are consistent'))
+            return
+        if not options['fix']:
+            raise CommandError(f'{len(inconsistent)} transactions have inconsistent paid amounts')
+        Transactions.objects.filter(
+            pk__in=[pk for pk, *_ in inconsistent]
+        ).refresh_paid_amounts()
+        # update() sends no signals, so cached responses are invalidated here
+        for owner_id in {owner_id for _, owner_id, *_ in inconsistent}:
+            bump_user_data_version(owner_id)
+        self.stdout.write(self.style.SUCCESS(f'Fixed {len(inconsistent)} transactions'))
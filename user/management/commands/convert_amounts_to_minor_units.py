@@ -0,0 +1,122 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Round
+from django.db.transaction import atomic
+
+from user.models import Repayments, Transactions
+
+# Amount columns of each model converted by the command. paid_amount is
+# not multiplied, it is recounted from the converted repayments instead.
+# The columns must still be floats, see Command.check_columns.
+AMOUNT_FIELDS = {
+    "transactions": (Transactions, ("amount",)),
+    "repayments": (Repayments, ("amount",)),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Multiply amounts stored in major units by 10 ** MONEY_SCALE, in '
+        'batches of ascending id each committed on its own. Run it once, '
+        'while the amount columns are still floats, then generate and apply '
+        'the migration that changes them to integers. It refuses to run on '
+        'integer columns, as casting floats to integers drops the decimals. '
+        'An interrupted run is resumed with --model and --start-after set to '
+        'the last model and id reported. Converting repayments recounts the '
+        'paid amounts of every transaction, or, if paid_amount has no column '
+        'yet, leaves that to backfill_paid_amounts after migrating'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows updated per statement'
+        )
+        parser.add_argument(
+            '--model', choices=list(AMOUNT_FIELDS),
+            help='Only convert this model, defaults to every model in turn'
+        )
+        parser.add_argument(
+            '--start-after', type=int, default=0,
+            help='Only convert rows with a greater id'
+        )
+
+    def iter_batches(self, model, start_after: int, batch_size: int):
+        """Yields the ids of model above start_after, batch_size at a time."""
+        last_id = start_after
+        while ids := list(
+            model.objects.filter(pk__gt=last_id)
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        ):
+            yield ids
+            last_id = ids[-1]
+
+    def get_column_types(self, model) -> dict:
+        """Maps the columns of model's table to the field type they introspect as."""
+        with connection.cursor() as cursor:
+            return {
+                column.name: connection.introspection.get_field_type(
+                    column.type_code, column
+                )
+                for column in connection.introspection.get_table_description(
+                    cursor, model._meta.db_table
+                )
+            }
+
+    def check_columns(self, names: list) -> None:
+        """
+        Raises:
+            CommandError: If an amount column is no longer a float, meaning it
+                was migrated, and with it rounded, before being converted.
+        """
+        for name in names:
+            model, fields = AMOUNT_FIELDS[name]
+            column_types = self.get_column_types(model)
+            for field in fields:
+                column = model._meta.get_field(field).column
+                if column_types.get(column) != 'FloatField':
+                    raise CommandError(
+                        f'{model._meta.db_table}.{column} is not a float '
+                        f'column, its amounts were already converted or '
+                        f'migrated to integers'
+                    )
+
+    def handle(self, *args, **options):
+        factor = 10 ** settings.MONEY_SCALE
+        names = [options['model']] if options['model'] else list(AMOUNT_FIELDS)
+        self.check_columns(names)
+        for name in names:
+            model, fields = AMOUNT_FIELDS[name]
+            start_after = options['start_after'] if options['model'] else 0
+            total = 0
+            for ids in self.iter_batches(model, start_after, options['batch_size']):
+                # The base manager skips the paid amount recount of
+                # Repayments.objects.update(), done once below
+                with atomic():
+                    total += model._base_manager.filter(pk__in=ids).update(**{
+                        field: Round(F(field) * factor) for field in fields
+                    })
+                self.stdout.write(f'Converted {name} up to id {ids[-1]}')
+            self.stdout.write(self.style.SUCCESS(f'Converted {total} {name}'))
+        if 'repayments' not in names:
+            return
+        paid_amount = Transactions._meta.get_field('paid_amount').column
+        if paid_amount not in self.get_column_types(Transactions):
+            self.stdout.write(
+                'paid_amount has no column yet, run backfill_paid_amounts '
+                'after migrating'
+            )
+        else:
+            # Recounted from every repayment, so the result does not depend
+            # on the order the models were converted in
+            total = 0
+            for ids in self.iter_batches(Transactions, 0, options['batch_size']):
+                with atomic():
+                    total += Transactions.objects.filter(
+                        pk__in=ids
+                    ).refresh_paid_amounts()
+            self.stdout.write(self.style.SUCCESS(
+                f'Recounted the paid amounts of {total} transactions'
+            ))
@@ -0,0 +1,19 @@
+from django.db.models import Manager
+
+from user.querysets import RepaymentsQuerySet, TransactionsQuerySet
+
+
+class TransactionsManager(Manager):
+    def get_queryset(self):
+        return TransactionsQuerySet(self.model, using=self._db)
+
+    def add_paid_amounts(self, deltas: dict) -> int:
+        return self.get_queryset().add_paid_amounts(deltas)
+
+    def filter_inconsistent_paid_amounts(self):
+        return self.get_queryset().filter_inconsistent_paid_amounts()
+
+
+class RepaymentsManager(Manager):
+    def get_queryset(self):
+        return RepaymentsQuerySet(self.model, using=self._db)
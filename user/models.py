@@ -1,9 +1,15 @@
+from collections import defaultdict
+
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.transaction import atomic
 
+from root.utils.fields import to_major_units
 from root.utils.models import MetaModel
 from user.choices import TransactionTypeChoices
+from user.managers import RepaymentsManager, TransactionsManager
+from user.querysets import PAID_AMOUNT_FIELDS
 
 # Create your models here.
 
@@ -100,7 +106,8 @@ class Transactions(MetaModel):
     _type = models.CharField(
         max_length=10, choices=TransactionTypeChoices.choices
     )
-    amount = models.FloatField()
+    # Minor units, see MONEY_SCALE
+    amount = models.BigIntegerField()
     description = models.TextField(blank=True)
     return_date = models.DateTimeField(null=True)
     date = models.DateTimeField(null=True, blank=True)
@@ -115,13 +122,16 @@ class Transactions(MetaModel):
         null=True, blank=True
     )
     is_active = models.BooleanField(default=True)
+    # Sum of the repayments, kept up to date by Repayments.save(), the
+    # bulk methods of its queryset and the post_delete signal
+    paid_amount = models.BigIntegerField(default=0, editable=False)
+    pending_amount = models.GeneratedField(
+        expression=models.F("amount") - models.F("paid_amount"),
+        output_field=models.BigIntegerField(),
+        db_persist=True
+    )
 
-    @property
-    def pending_amount(self) -> float:
-        paid_amount = sum(
-            self.repayments.all().values_list("amount", flat=True)
-        )
-        return self.amount - paid_amount
+    objects: TransactionsManager = TransactionsManager()
 
     class Meta:
         db_table = "transactions"
@@ -129,13 +139,29 @@ class Transactions(MetaModel):
 
     def __str__(self) -> str: return self.label
 
+    def save(self, *args, **kwargs):
+        # paid_amount is only changed by relative updates, so saving an
+        # instance loaded before a repayment must not write it back
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        if kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and not field.generated and
+                field.name != "paid_amount"
+            ]
+        super().save(*args, **kwargs)
+        # Unlike inserts, updates do not return the generated pending_amount
+        self.refresh_from_db(fields=["paid_amount", "pending_amount"])
+
 
 class Repayments(MetaModel):
     label = models.CharField(max_length=50)
     transaction = models.ForeignKey(
         Transactions, related_name="repayments", on_delete=models.CASCADE
     )
-    amount = models.FloatField()
+    # Minor units, see MONEY_SCALE
+    amount = models.BigIntegerField()
     remarks = models.TextField(blank=True)
     date = models.DateTimeField(null=True, blank=True)
     payment_method = models.ForeignKey(
@@ -149,13 +175,28 @@ class Repayments(MetaModel):
         null=True, blank=True
     )
 
-    def clean(self):
-        total_paid_amount = sum(
-            Repayments.objects.filter(
-                transaction=self.transaction
-            ).exclude(id=self.id).values_list("amount", flat=True)
-        )
-        pending_amount = self.transaction.amount - total_paid_amount
+    objects: RepaymentsManager = RepaymentsManager()
+
+    # Transaction id and amount as last loaded or saved, subtracted from
+    # the paid amount when the repayment is deleted
+    _loaded_paid_amount = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "transaction_id" in instance.__dict__ and "amount" in instance.__dict__:
+            instance._loaded_paid_amount = (instance.transaction_id, instance.amount)
+        return instance
+
+    def validate_pending_amount(self, transaction: Transactions, loaded: tuple | None) -> None:
+        """
+        Checks the amount against the pending amount of transaction, read
+        from its locked row, leaving out the amount last saved on it.
+        """
+        paid_amount = transaction.paid_amount
+        if loaded and loaded[0] == transaction.pk:
+            paid_amount -= loaded[1]
+        pending_amount = transaction.amount - paid_amount
         if pending_amount == 0:
             raise ValidationError(
                 {
@@ -165,10 +206,9 @@ class Repayments(MetaModel):
         if self.amount > pending_amount:
             raise ValidationError(
                 {
-                    "amount": [f"The amount you entered exceeds the pending amount of {pending_amount}"]
+                    "amount": [f"The amount you entered exceeds the pending amount of {to_major_units(pending_amount)}"]
                 }
             )
-        return super().clean()
 
     class Meta:
         db_table = "repayments"
@@ -177,5 +217,35 @@ class Repayments(MetaModel):
     def __str__(self) -> str: return self.label
 
     def save(self, *args, **kwargs):
-        self.full_clean()
-        return super().save(*args, **kwargs)
+        # The transaction is checked while locking it
+        self.full_clean(exclude=["transaction"])
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not PAID_AMOUNT_FIELDS.intersection(update_fields):
+            return super().save(*args, **kwargs)
+        with atomic():
+            loaded = None
+            if not self._state.adding:
+                # Read under lock, the instance may be stale
+                loaded = Repayments.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values_list("transaction_id", "amount").first()
+            # Locks the transactions the amount moves between, in id order so
+            # concurrent saves cannot deadlock. Concurrent repayments of a
+            # transaction then validate and apply their amounts one at a time.
+            transactions = {
+                transaction.pk: transaction
+                for transaction in Transactions.objects.select_for_update().filter(
+                    pk__in={self.transaction_id, *(loaded[:1] if loaded else ())}
+                ).order_by("pk").only("amount", "paid_amount")
+            }
+            if self.transaction_id not in transactions:
+                raise ValidationError({"transaction": ["Invalid transaction"]})
+            self.validate_pending_amount(transactions[self.transaction_id], loaded)
+            super().save(*args, **kwargs)
+            # Moves the amount last saved to the transaction and amount saved now
+            deltas = defaultdict(int)
+            if loaded:
+                deltas[loaded[0]] -= loaded[1]
+            deltas[self.transaction_id] += self.amount
+            Transactions.objects.add_paid_amounts(deltas)
+            self._loaded_paid_amount = (self.transaction_id, self.amount)
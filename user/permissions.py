@@ -39,7 +39,7 @@ class IsOwnTransaction(BasePermission):
     """
 
     def has_object_permission(self, request: Request, view: View, obj: Transactions) -> bool:
-        return obj.contact.owner == request.user
+        return obj.contact.owner_id == request.user.pk
 
 
 class CanUpdateTransaction(BasePermission):
@@ -82,7 +82,7 @@ class IsOwnRepayment(BasePermission):
     """
 
     def has_object_permission(self, request: Request, view: View, obj: Repayments) -> bool:
-        return obj.transaction.contact.owner == request.user
+        return obj.transaction.contact.owner_id == request.user.pk
 
 
 class CanUpdateRepayment(BasePermission):
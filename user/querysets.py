@@ -0,0 +1,106 @@
+from collections import defaultdict
+
+from django.db.models import (BigIntegerField, Case, F, OuterRef, QuerySet,
+                              Subquery, Sum, Value, When)
+from django.db.models.functions import Coalesce
+from django.db.transaction import atomic
+
+# Repayment fields whose change moves an amount between transactions
+PAID_AMOUNT_FIELDS = {"amount", "transaction", "transaction_id"}
+
+
+class TransactionsQuerySet(QuerySet):
+    def get_repaid_amount(self) -> Coalesce:
+        """The sum of the repayments of the transaction in the outer query."""
+        repayments = self.model._meta.get_field("repayments").related_model
+        repaid_amount = (
+            repayments.objects
+            .filter(transaction=OuterRef("pk"))
+            .order_by()
+            .values("transaction")
+            .annotate(total=Sum("amount"))
+            .values("total")
+        )
+        return Coalesce(
+            Subquery(repaid_amount), Value(0), output_field=BigIntegerField()
+        )
+
+    def refresh_paid_amounts(self) -> int:
+        """Sets paid_amount of every transaction to the sum of its repayments, in one UPDATE."""
+        return self.update(paid_amount=self.get_repaid_amount())
+
+    def add_paid_amounts(self, deltas: dict) -> int:
+        """
+        Adds deltas, a mapping of transaction ids to amounts, to paid_amount
+        in one UPDATE relative to the stored values.
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if not deltas:
+            return 0
+        return self.filter(pk__in=deltas).update(paid_amount=F("paid_amount") + Case(
+            *(When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()),
+            output_field=BigIntegerField()
+        ))
+
+    def filter_inconsistent_paid_amounts(self) -> QuerySet:
+        return self.annotate(repaid_amount=self.get_repaid_amount()).exclude(
+            paid_amount=F("repaid_amount")
+        )
+
+
+class RepaymentsQuerySet(QuerySet):
+    """
+    Keeps Transactions.paid_amount up to date on the bulk paths, which
+    skip Repayments.save() and the post_delete signal. Deletes still send
+    post_delete per repayment, see user.signals.
+    """
+
+    def get_transactions(self) -> QuerySet:
+        return self.model._meta.get_field("transaction").related_model.objects.all()
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            if kwargs.get("ignore_conflicts") or kwargs.get("update_conflicts"):
+                # Which rows were written is not known, so recount them
+                self.get_transactions().filter(
+                    pk__in={obj.transaction_id for obj in objs}
+                ).refresh_paid_amounts()
+            else:
+                deltas = defaultdict(int)
+                for obj in objs:
+                    deltas[obj.transaction_id] += obj.amount
+                    obj._loaded_paid_amount = (obj.transaction_id, obj.amount)
+                self.get_transactions().add_paid_amounts(deltas)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if not PAID_AMOUNT_FIELDS.intersection(fields):
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        with atomic(using=self.db):
+            transaction_ids = set(
+                self.filter(pk__in=[obj.pk for obj in objs])
+                .values_list("transaction_id", flat=True)
+            )
+            rows = super().bulk_update(objs, fields, *args, **kwargs)
+            for obj in objs:
+                transaction_ids.add(obj.transaction_id)
+                obj._loaded_paid_amount = (obj.transaction_id, obj.amount)
+            self.get_transactions().filter(
+                pk__in=transaction_ids
+            ).refresh_paid_amounts()
+        return rows
+
+    def update(self, **kwargs):
+        if not PAID_AMOUNT_FIELDS.intersection(kwargs):
+            return super().update(**kwargs)
+        with atomic(using=self.db):
+            transaction_ids = set(self.values_list("transaction_id", flat=True))
+            rows = super().update(**kwargs)
+            for name in ("transaction", "transaction_id"):
+                if name in kwargs:
+                    transaction_ids.add(getattr(kwargs[name], "pk", kwargs[name]))
+            self.get_transactions().filter(
+                pk__in=transaction_ids
+            ).refresh_paid_amounts()
+        return rows
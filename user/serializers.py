@@ -1,10 +1,14 @@
 from collections import OrderedDict
 
-from django.db.models import QuerySet
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.db.transaction import atomic
 from rest_framework import serializers
 from rest_framework.request import Request
 
+from root.utils.fields import MoneyField
 from root.utils.models import DEFAULT_READ_ONLY_FIELDS
+from root.utils.response_cache import bump_user_data_version
 
 from .models import (ContactGroup, Contacts, PaymentMethods, PaymentSources,
                      Repayments, Transactions)
@@ -82,11 +86,15 @@ class ContactsSerializer(serializers.ModelSerializer):
 
 class TransactionsSerializer(serializers.ModelSerializer):
     class RepaymentsSerializer(serializers.ModelSerializer):
+        amount = MoneyField()
+
         class Meta:
             model = Repayments
             exclude = ("transaction",)
     repayments = serializers.SerializerMethodField()
-    pending_amount = serializers.SerializerMethodField()
+    amount = MoneyField()
+    paid_amount = MoneyField(read_only=True)
+    pending_amount = MoneyField(read_only=True)
 
     def validate_contact(self, value: Contacts) -> Contacts:
         if value.owner == self.context.get("request").user:
@@ -106,22 +114,25 @@ class TransactionsSerializer(serializers.ModelSerializer):
     def get_repayments(self, instance: Transactions):
         return self.RepaymentsSerializer(instance.repayments.all(), many=True).data
 
-    def get_pending_amount(self, instance: Transactions) -> float:
-        return instance.pending_amount
-
-    def validate_amount(self, value: float) -> float:
+    def validate_amount(self, value: int) -> int:
         if value < 0:
             raise serializers.ValidationError("Enter valid amount")
-        if instance := getattr(self, "instance", None):
-            repayment_amount = sum(
-                instance.repayments.values_list("amount", flat=True)
-            )
-            if value < repayment_amount:
-                raise serializers.ValidationError(
-                    "Amount should not exceed repayment_amount"
-                )
         return value
 
+    def update(self, instance: Transactions, validated_data: dict) -> Transactions:
+        with atomic():
+            if "amount" in validated_data:
+                # Read from the locked row, so no repayment is added between
+                # the check and the update
+                paid_amount = Transactions.objects.select_for_update().values_list(
+                    "paid_amount", flat=True
+                ).get(pk=instance.pk)
+                if validated_data["amount"] < paid_amount:
+                    raise serializers.ValidationError({
+                        "amount": ["Amount should not exceed repayment_amount"]
+                    })
+            return super().update(instance, validated_data)
+
     class Meta:
         model = Transactions
         fields = '__all__'
@@ -130,7 +141,152 @@ class TransactionsSerializer(serializers.ModelSerializer):
         }
         read_only_fields = DEFAULT_READ_ONLY_FIELDS
 
+
+class BulkTransactionSerializer(serializers.ModelSerializer):
+    """
+    One item of BulkTransactionsSerializer. Related objects are resolved
+    from the maps loaded once for the whole batch, passed in the context,
+    so validating an item runs no query.
+    """
+    amount = MoneyField()
+    contact = serializers.IntegerField()
+    payment_method = serializers.IntegerField(required=False, allow_null=True)
+    payment_source = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = Transactions
+        fields = (
+            "label", "contact", "_type", "amount", "description",
+            "return_date", "date", "payment_method",
+            "transaction_reference", "payment_source"
+        )
+
+    def validate_contact(self, value: int) -> Contacts:
+        if contact := self.context["contacts"].get(value):
+            return contact
+        raise serializers.ValidationError("Invalid contact")
+
+    def validate_payment_method(self, value: int | None) -> PaymentMethods | None:
+        if value is None:
+            return None
+        if payment_method := self.context["payment_methods"].get(value):
+            return payment_method
+        raise serializers.ValidationError("Invalid payment method")
+
+    def validate_payment_source(self, value: int | None) -> PaymentSources | None:
+        if value is None:
+            return None
+        if payment_source := self.context["payment_sources"].get(value):
+            return payment_source
+        raise serializers.ValidationError("Invalid payment source")
+
+    def validate_amount(self, value: int) -> int:
+        if value < 0:
+            raise serializers.ValidationError("Enter valid amount")
+        return value
+
+    def validate(self, attrs: dict) -> dict:
+        if attrs.get("payment_method") is None:
+            if not (default_payment_method := self.context["default_payment_method"]):
+                raise serializers.ValidationError(
+                    {"payment_method": ["No default payment method"]}
+                )
+            attrs["payment_method"] = default_payment_method
+        return attrs
+
+
+class BulkTransactionsSerializer(serializers.Serializer):
+    """
+    Creates a list of transactions with one bulk insert.
+
+    Contacts, payment methods and payment sources referenced by the batch
+    are loaded with one query each, scoped to the user. Invalid items are
+    reported by index and the valid ones are created, unless
+    all_or_nothing is set, then any invalid item fails the whole batch.
+    """
+    transactions = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False,
+        max_length=settings.BULK_TRANSACTIONS_MAX_ITEMS
+    )
+    all_or_nothing = serializers.BooleanField(default=False)
+
+    @staticmethod
+    def get_ids(items: list, name: str) -> set:
+        ids = set()
+        for item in items:
+            try:
+                ids.add(int(item[name]))
+            except (KeyError, TypeError, ValueError):
+                pass
+        return ids
+
+    def get_item_context(self, items: list) -> dict:
+        user = self.context["request"].user
+        contacts = Contacts.objects.filter(
+            owner=user, pk__in=self.get_ids(items, "contact")
+        ).in_bulk()
+        # Requested payment methods the user may use, and the candidates
+        # for the default, the same as TransactionsSerializer picks
+        payment_methods = list(
+            PaymentMethods.objects.filter(
+                Q(owner=user) | Q(owner__is_superuser=True, is_common=True)
+            ).filter(
+                Q(pk__in=self.get_ids(items, "payment_method")) |
+                Q(owner=user, is_default=True) | Q(is_common=True)
+            ).order_by("pk")
+        )
+        default_payment_method = ([
+            payment_method for payment_method in payment_methods
+            if payment_method.owner_id == user.pk and payment_method.is_default
+        ] or [
+            payment_method for payment_method in payment_methods
+            if payment_method.is_common
+        ] or [None])[0]
+        payment_source_ids = self.get_ids(items, "payment_source")
+        payment_sources = PaymentSources.objects.filter(
+            owner=user, pk__in=payment_source_ids
+        ).in_bulk() if payment_source_ids else {}
+        return {
+            **self.context,
+            "contacts": contacts,
+            "payment_methods": {
+                payment_method.pk: payment_method for payment_method in payment_methods
+            },
+            "default_payment_method": default_payment_method,
+            "payment_sources": payment_sources
+        }
+
+    def save(self, **kwargs) -> dict:
+        items = self.validated_data["transactions"]
+        context = self.get_item_context(items)
+        transactions = []
+        errors = {}
+        for index, item in enumerate(items):
+            serializer = BulkTransactionSerializer(data=item, context=context)
+            if serializer.is_valid():
+                transactions.append(Transactions(**serializer.validated_data))
+            else:
+                errors[index] = serializer.errors
+        if errors and self.validated_data["all_or_nothing"]:
+            raise serializers.ValidationError({"transactions": errors})
+        if transactions:
+            transactions = Transactions.objects.bulk_create(transactions)
+            # bulk_create sends no signals, so cached responses are invalidated here
+            bump_user_data_version(self.context["request"].user.pk)
+            for transaction in transactions:
+                # New rows have no repayments, so nothing is fetched for them
+                transaction._prefetched_objects_cache = {
+                    "repayments": Repayments.objects.none()
+                }
+        return {
+            "created": TransactionsSerializer(transactions, many=True).data,
+            "errors": errors
+        }
+
+
 class RepaymentsSerializer(serializers.ModelSerializer):
+    amount = MoneyField()
+
     def validate_transaction(self, value: Transactions) -> Transactions:
         if value.contact.owner == self.context.get("request").user:
             return value
@@ -234,20 +390,11 @@ class ImportContactsSerializer(serializers.Serializer):
 
 
 class SummarySerializer(serializers.ModelSerializer):
-    pending_amount = serializers.SerializerMethodField()
-    total_transaction_amount = serializers.SerializerMethodField()
-    total_repayment_amount = serializers.SerializerMethodField()
+    pending_amount = MoneyField(read_only=True)
+    total_transaction_amount = MoneyField(read_only=True)
+    total_repayment_amount = MoneyField(read_only=True)
 
     class Meta:
         model = Contacts
         exclude = ("owner",)
         depth = 1
-
-    def get_pending_amount(self, obj):
-        return getattr(obj, "pending_amount", 0)
-
-    def get_total_transaction_amount(self, obj):
-        return getattr(obj, "total_transaction_amount", 0)
-
-    def get_total_repayment_amount(self, obj):
-        return getattr(obj, "total_repayment_amount", 0)
@@ -1,7 +1,22 @@
-from django.db.models.signals import pre_save
+from operator import attrgetter
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from .models import ContactGroup
+from root.utils.response_cache import bump_user_data_version
+
+from .models import (ContactGroup, Contacts, PaymentMethods, PaymentSources,
+                     Repayments, Transactions)
+
+# Path from each model to the id of the user owning it
+OWNER_ID_GETTERS = {
+    ContactGroup: attrgetter("owner_id"),
+    Contacts: attrgetter("owner_id"),
+    PaymentMethods: attrgetter("owner_id"),
+    PaymentSources: attrgetter("owner_id"),
+    Transactions: attrgetter("contact.owner_id"),
+    Repayments: attrgetter("transaction.contact.owner_id"),
+}
 
 
 @receiver(pre_save, sender=ContactGroup)
@@ -10,3 +25,44 @@ def update_parent_group(sender, instance: ContactGroup, **kwargs):
         ContactGroup.objects.filter(
             parent_group=instance.parent_group
         ).update(parent_group=None)
+
+
+@receiver(post_delete, sender=Repayments)
+def subtract_deleted_repayment(sender, instance: Repayments, **kwargs):
+    """
+    Subtracts a deleted repayment from the paid amount of its transaction.
+    """
+    origin = kwargs.get("origin")
+    if getattr(origin, "model", type(origin)) is not Repayments:
+        # Cascaded delete, the transaction is deleted as well
+        return
+    transaction_id, amount = instance._loaded_paid_amount or (
+        instance.transaction_id, instance.amount
+    )
+    Transactions.objects.add_paid_amounts({transaction_id: -amount})
+
+
+def invalidate_user_response_cache(sender, instance, **kwargs):
+    """
+    Invalidates the cached responses of the owner of any changed user data.
+    """
+    origin = kwargs.get("origin")
+    if origin is not None and getattr(origin, "model", type(origin)) is not sender:
+        # Cascaded delete. Either the owner is deleted as well, or the
+        # deleted parent, owned by the same user, invalidates it in its own
+        # signal, so the owner is not looked up row by row.
+        return
+    bump_user_data_version(OWNER_ID_GETTERS[sender](instance))
+
+
+# Connected per model, a receiver without a sender would stop Django from
+# fast deleting the rows of every other model
+for model in OWNER_ID_GETTERS:
+    post_save.connect(invalidate_user_response_cache, sender=model)
+    post_delete.connect(invalidate_user_response_cache, sender=model)
+
+
+@receiver(m2m_changed, sender=Contacts.groups.through)
+def contact_groups_changed(sender, instance, action: str, **kwargs):
+    if action.startswith("post_"):
+        bump_user_data_version(instance.owner_id)
@@ -2,7 +2,9 @@ import logging
 
 from celery import shared_task
 from django.db import transaction as db_transaction
-from django.db.models import F, Sum
+from django.db.models import F
+
+from root.utils.response_cache import bump_user_data_version
 
 logger = logging.getLogger(__name__)
 
@@ -19,12 +21,14 @@ def mark_transactions_inactive(self):
 
     queryset = (
         Transactions.objects
-        .filter(is_active=True)
-        .annotate(total_repaid=Sum("repayments__amount"))
-        .filter(total_repaid=F("amount"))
+        .filter(is_active=True, paid_amount__gte=F("amount"))
     )
 
     total = queryset.count()
     logger.info(f"Found {total} transactions eligible for inactivation")
 
+    owner_ids = set(queryset.values_list("contact__owner_id", flat=True))
     queryset.update(is_active=False)
+    # update() sends no signals, so cached responses are invalidated here
+    for owner_id in owner_ids:
+        bump_user_data_version(owner_id)
@@ -1,15 +1,29 @@
 from copy import deepcopy
-
-from django.core.management import call_command
+from io import StringIO
+from threading import Barrier, Thread
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models.deletion import Collector
+from django.test import override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now
+from django_celery_results.models import TaskResult
 from pytest import fixture
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 
+from main.models import OTP
 from main.tests import BasicTestsMixin
+from root.utils.fields import to_major_units, to_minor_units
+from root.utils.tiered_cache import local_cache
 
 from .choices import TransactionTypeChoices
 from .models import (ContactGroup, Contacts, PaymentMethods, PaymentSources,
                      Repayments, Transactions)
+from .tasks import mark_transactions_inactive
 
 # Create your tests here.
 
@@ -34,6 +48,9 @@ DEFAULT_REPAYMET_LABEL = "Test Repayment"
 
 @fixture(autouse=True)
 def load_fixture(django_db_blocker):
+    # Cached responses and tokens must not leak between tests
+    cache.clear()
+    local_cache.clear()
     with django_db_blocker.unblock():
         call_command(
             "loaddata", "main/fixtures/user.json",
@@ -77,7 +94,7 @@ class MainTestsMixin(BasicTestsMixin):
         kwargs["label"] = kwargs.get("label", DEFAULT_TRANSACTION_NAME)
         kwargs["contact"] = kwargs.get("contact", self.create_contact())
         kwargs["_type"] = _type
-        kwargs["amount"] = kwargs.get("amount", 10)
+        kwargs["amount"] = kwargs.get("amount", to_minor_units(10))
         kwargs["description"] = kwargs.get("description", "")
         kwargs["return_date"] = kwargs.get("return_date")
         kwargs["date"] = kwargs.get("date", now())
@@ -122,6 +139,18 @@ class MainTestsMixin(BasicTestsMixin):
         return PaymentSources.objects.create(**kwargs)
 
 
+class OwnerDataTestsMixin(MainTestsMixin):
+    """
+    Signs in a user owning a contact. Listed before the test case class, so
+    its setUp runs.
+    """
+    def setUp(self):
+        super().setUp()
+        self.token = self.create_user_token()
+        self.headers = {"HTTP_AUTHORIZATION": f"Token {self.token.key}"}
+        self.contact = self.create_contact(owner=self.token.user)
+
+
 class ContactGroupsAPITestCase(APITestCase, MainTestsMixin):
     """
     Contact Groups CRUD API Test cases
@@ -1437,7 +1466,7 @@ class RepaymentAPITestCase(APITestCase, MainTestsMixin):
 
     def test_create_repayment_with_amount_equal_to_transaction_amount(self):
         data = deepcopy(self.payload)
-        data.update(amount=self.credit_transaction.amount)
+        data.update(amount=to_major_units(self.credit_transaction.amount))
         response = self.client.post(
             self.base_url + "/",
             data,
@@ -1449,7 +1478,7 @@ class RepaymentAPITestCase(APITestCase, MainTestsMixin):
 
     def test_create_repayment_with_amount_greater_than_transaction_amount(self):
         data = deepcopy(self.payload)
-        data.update(amount=self.credit_transaction.amount+1)
+        data.update(amount=to_major_units(self.credit_transaction.amount + 1))
         response = self.client.post(
             self.base_url + "/",
             data,
@@ -1700,7 +1729,7 @@ class RepaymentAPITestCase(APITestCase, MainTestsMixin):
     def test_update_repayment_with_amount_equal_to_transaction_amount(self):
         instance = self.create_repayment()
         data = deepcopy(self.payload)
-        data.update(amount=self.credit_transaction.amount)
+        data.update(amount=to_major_units(self.credit_transaction.amount))
         response = self.client.put(
             self.base_url + f"/{instance.id}/",
             data,
@@ -1713,7 +1742,7 @@ class RepaymentAPITestCase(APITestCase, MainTestsMixin):
     def test_update_repayment_with_amount_greater_than_transaction_amount(self):
         instance = self.create_repayment()
         data = deepcopy(self.payload)
-        data.update(amount=self.credit_transaction.amount+1)
+        data.update(amount=to_major_units(self.credit_transaction.amount + 1))
         response = self.client.put(
             self.base_url + f"/{instance.id}/",
             data,
@@ -2162,3 +2191,668 @@ class SummaryAPITestCase(APITestCase, MainTestsMixin):
             **self.headers
         )
         assert response.status_code == 200
+
+
+class PaidAmountTestCase(OwnerDataTestsMixin, APITestCase):
+    """
+    Denormalized paid and pending amount test cases
+    """
+    def setUp(self):
+        super().setUp()
+        self.transaction = self.create_credit_transaction(
+            contact=self.contact, amount=100
+        )
+        self.other_transaction = self.create_credit_transaction(
+            contact=self.contact, amount=50, label="Other Transaction"
+        )
+
+    def assert_paid_amounts(self, paid_amount: int, other_paid_amount: int = 0):
+        self.transaction.refresh_from_db()
+        self.other_transaction.refresh_from_db()
+        assert self.transaction.paid_amount == paid_amount, "Unexpected paid amount"
+        assert (
+            self.transaction.pending_amount == self.transaction.amount - paid_amount
+        ), "Expected the pending amount to follow the paid amount"
+        assert (
+            self.other_transaction.paid_amount == other_paid_amount
+        ), "Unexpected paid amount of the other transaction"
+
+    def test_repayment_create_update_and_delete(self):
+        """
+        Tests that saving and deleting repayments keeps the paid amounts current.
+        """
+        repayment = self.create_repayment(transaction=self.transaction, amount=30)
+        self.create_repayment(transaction=self.transaction, amount=20, label="Second")
+        self.assert_paid_amounts(50)
+        repayment = Repayments.objects.get(pk=repayment.pk)
+        repayment.amount = 10
+        repayment.save()
+        self.assert_paid_amounts(30)
+        repayment.transaction = self.other_transaction
+        repayment.save()
+        self.assert_paid_amounts(20, 10)
+        repayment.delete()
+        self.assert_paid_amounts(20)
+        Repayments.objects.filter(transaction=self.transaction).delete()
+        self.assert_paid_amounts(0)
+
+    def test_repayment_bulk_paths(self):
+        """
+        Tests that bulk_create, update and bulk_update keep the paid amounts current.
+        """
+        repayments = Repayments.objects.bulk_create([
+            Repayments(
+                label=f"Repayment {index}", transaction=self.transaction,
+                amount=10, payment_method=self.create_payment_method()
+            )
+            for index in range(3)
+        ])
+        self.assert_paid_amounts(30)
+        Repayments.objects.filter(pk=repayments[0].pk).update(amount=5)
+        self.assert_paid_amounts(25)
+        Repayments.objects.filter(pk=repayments[1].pk).update(
+            transaction=self.other_transaction
+        )
+        self.assert_paid_amounts(15, 10)
+        repayments[2].amount = 1
+        Repayments.objects.bulk_update([repayments[2]], ["amount"])
+        self.assert_paid_amounts(6, 10)
+
+    def test_stale_transaction_save_keeps_paid_amount(self):
+        """
+        Tests that saving a transaction loaded before a repayment does not reset its paid amount.
+        """
+        stale_transaction = Transactions.objects.get(pk=self.transaction.pk)
+        self.create_repayment(transaction=self.transaction, amount=30)
+        stale_transaction.label = "Renamed"
+        stale_transaction.save()
+        self.assert_paid_amounts(30)
+
+    def test_transaction_api_reads_pending_amount(self):
+        """
+        Tests that the transaction API returns the stored paid and pending amounts.
+        """
+        self.create_repayment(transaction=self.transaction, amount=30)
+        response = self.client.get(
+            f"/user/transaction/{self.transaction.pk}/", **self.headers
+        )
+        assert response.status_code == 200, "Expected status code 200"
+        assert response.data["paid_amount"] == to_major_units(30), "Unexpected paid amount"
+        assert response.data["pending_amount"] == to_major_units(70), "Unexpected pending amount"
+
+    def test_backfill_paid_amounts(self):
+        """
+        Tests that backfill_paid_amounts recounts every transaction in batches.
+        """
+        self.create_repayment(transaction=self.transaction, amount=30)
+        self.create_repayment(transaction=self.other_transaction, amount=5)
+        Transactions.objects.update(paid_amount=0)
+        stdout = StringIO()
+        call_command("backfill_paid_amounts", batch_size=1, stdout=stdout)
+        assert (
+            f"Backfilled transactions up to id {self.transaction.pk}" in stdout.getvalue()
+        ), "Expected the progress of each batch to be reported"
+        assert (
+            f"Backfilled {Transactions.objects.count()} transactions" in stdout.getvalue()
+        ), "Expected every transaction to be backfilled"
+        self.assert_paid_amounts(30, 5)
+
+    def test_backfill_paid_amounts_resumes(self):
+        """
+        Tests that backfill_paid_amounts skips the ids up to --start-after.
+        """
+        self.create_repayment(transaction=self.transaction, amount=30)
+        self.create_repayment(transaction=self.other_transaction, amount=5)
+        Transactions.objects.update(paid_amount=0)
+        call_command(
+            "backfill_paid_amounts", start_after=self.transaction.pk, stdout=StringIO()
+        )
+        self.assert_paid_amounts(0, 5)
+
+    def test_check_paid_amounts(self):
+        """
+        Tests that check_paid_amounts fails on drifted paid amounts and fixes them with --fix.
+        """
+        self.create_repayment(transaction=self.transaction, amount=30)
+        call_command("check_paid_amounts", stdout=StringIO())
+        Transactions.objects.filter(pk=self.transaction.pk).update(paid_amount=1)
+        with self.assertRaises(CommandError):
+            call_command("check_paid_amounts", stdout=StringIO())
+        stdout = StringIO()
+        call_command("check_paid_amounts", fix=True, stdout=stdout)
+        assert "Fixed 1 transactions" in stdout.getvalue(), "Expected 1 transaction fixed"
+        self.assert_paid_amounts(30)
+
+
+class RepaymentValidationTestCase(OwnerDataTestsMixin, APITestCase):
+    """
+    Repayment amount validation against the locked transaction row
+    """
+    def setUp(self):
+        super().setUp()
+        self.payment_method = self.create_payment_method()
+        self.transaction = self.create_credit_transaction(
+            contact=self.contact, amount=100
+        )
+        self.other_transaction = self.create_credit_transaction(
+            contact=self.contact, amount=50, label="Other Transaction"
+        )
+
+    def create_repayment(self, **kwargs) -> Repayments:
+        kwargs.setdefault("transaction", self.transaction)
+        return Repayments.objects.create(
+            label=DEFAULT_REPAYMET_LABEL, payment_method=self.payment_method, **kwargs
+        )
+
+    def test_create_reads_transaction_once(self):
+        """
+        Tests that creating a repayment reads its transaction once, locking the row.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.create_repayment(amount=60)
+        transaction_reads = [
+            query["sql"] for query in queries
+            if query["sql"].startswith("SELECT") and '"transactions"' in query["sql"]
+        ]
+        assert len(transaction_reads) == 1, "Expected one read of the transaction"
+        if connection.features.has_select_for_update:
+            assert "FOR UPDATE" in transaction_reads[0], "Expected the row to be locked"
+
+    def test_create_exceeding_pending_amount(self):
+        """
+        Tests that repayments over the pending amount are rejected.
+        """
+        self.create_repayment(amount=60)
+        with self.assertRaises(ValidationError):
+            self.create_repayment(amount=41)
+        self.create_repayment(amount=40)
+        with self.assertRaises(ValidationError):
+            self.create_repayment(amount=1)
+
+    def test_update_leaves_out_own_amount(self):
+        """
+        Tests that an updated repayment is validated without its previously saved amount.
+        """
+        repayment = self.create_repayment(amount=60)
+        repayment.amount = 100
+        repayment.save()
+        repayment.amount = 101
+        with self.assertRaises(ValidationError):
+            repayment.save()
+        self.transaction.refresh_from_db()
+        assert self.transaction.paid_amount == 100, "Expected the rejected update to be left out"
+
+    def test_move_validates_new_transaction(self):
+        """
+        Tests that a repayment moved to another transaction is validated against that transaction.
+        """
+        repayment = self.create_repayment(amount=60)
+        repayment.transaction = self.other_transaction
+        with self.assertRaises(ValidationError):
+            repayment.save()
+        repayment.amount = 50
+        repayment.save()
+        self.transaction.refresh_from_db()
+        self.other_transaction.refresh_from_db()
+        assert self.transaction.paid_amount == 0, "Expected the amount moved off the transaction"
+        assert self.other_transaction.paid_amount == 50, "Expected the amount moved to the other transaction"
+
+    def test_transaction_amount_below_paid_amount(self):
+        """
+        Tests that a transaction amount cannot be lowered below its paid amount.
+        """
+        self.create_repayment(amount=60)
+        response = self.client.patch(
+            f"/user/transaction/{self.transaction.pk}/", {"amount": to_major_units(59)},
+            content_type="application/json", **self.headers
+        )
+        assert response.status_code == 400, "Expected status code 400"
+        assert "amount" in response.data["error"], "Expected an amount error"
+        response = self.client.patch(
+            f"/user/transaction/{self.transaction.pk}/", {"amount": to_major_units(60)},
+            content_type="application/json", **self.headers
+        )
+        assert response.status_code == 200, "Expected status code 200"
+        assert response.data["pending_amount"] == 0, "Expected nothing pending"
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentRepaymentsTestCase(APITransactionTestCase, MainTestsMixin):
+    """
+    Concurrent repayments of one transaction, each from its own connection
+    """
+    THREADS = 8
+
+    def test_concurrent_repayments_do_not_overpay(self):
+        """
+        Tests that concurrent repayments never exceed the transaction amount.
+        """
+        transaction = self.create_credit_transaction(amount=100)
+        payment_method = self.create_payment_method()
+        barrier = Barrier(self.THREADS)
+        results = []
+
+        def repay():
+            try:
+                barrier.wait()
+                Repayments.objects.create(
+                    label=DEFAULT_REPAYMET_LABEL, transaction_id=transaction.pk,
+                    amount=30, payment_method=payment_method
+                )
+                results.append(True)
+            except ValidationError:
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [Thread(target=repay) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results.count(True) == 3, "Expected only 3 repayments to fit"
+        transaction.refresh_from_db()
+        assert transaction.paid_amount == 90, "Unexpected paid amount"
+        assert sum(
+            Repayments.objects.filter(transaction=transaction).values_list("amount", flat=True)
+        ) == 90, "Expected the paid amount to match the stored repayments"
+
+
+class MoneyAmountsTestCase(OwnerDataTestsMixin, APITestCase):
+    """
+    Amounts stored as integer minor units and converted at the API
+    """
+    def setUp(self):
+        super().setUp()
+        self.transaction = self.create_credit_transaction(
+            contact=self.contact, amount=to_minor_units("0.3")
+        )
+
+    def convert_float_amounts(self, column_types: dict | None = None, **options):
+        # The test database is migrated to integer columns already
+        if column_types is None:
+            column_types = {"amount": "FloatField", "paid_amount": "FloatField"}
+        with patch(
+            "user.management.commands.convert_amounts_to_minor_units."
+            "Command.get_column_types", return_value=column_types
+        ):
+            call_command("convert_amounts_to_minor_units", **options)
+
+    def create_float_amounts(self):
+        # Amounts as stored before the conversion, in major units
+        Repayments.objects.create(
+            label=DEFAULT_REPAYMET_LABEL, transaction=self.transaction,
+            amount=10, payment_method=self.create_payment_method()
+        )
+        Transactions.objects.filter(pk=self.transaction.pk).update(amount=3)
+        Repayments.objects.update(amount=1)
+
+    def repay(self, amount: str):
+        return self.client.post(
+            "/user/repayment/", {
+                "label": DEFAULT_REPAYMET_LABEL, "amount": amount,
+                "transaction": self.transaction.pk,
+                "payment_method": self.create_payment_method().pk
+            }, content_type="application/json", **self.headers
+        )
+
+    def test_amounts_add_up_exactly(self):
+        """
+        Tests that repayments of 0.1 and 0.2 settle a transaction of 0.3.
+        """
+        assert self.repay("0.1").status_code == 201, "Expected status code 201"
+        assert self.repay("0.2").status_code == 201, "Expected status code 201"
+        self.transaction.refresh_from_db()
+        assert self.transaction.paid_amount == 30, "Unexpected paid amount"
+        assert self.transaction.pending_amount == 0, "Expected nothing pending"
+        mark_transactions_inactive()
+        self.transaction.refresh_from_db()
+        assert not self.transaction.is_active, "Expected the settled transaction inactive"
+        response = self.client.get("/user/summary", **self.headers)
+        assert response.json()["data"] == [], "Expected an empty summary"
+
+    def test_amount_with_too_many_decimal_places(self):
+        """
+        Tests that amounts with more than MONEY_SCALE decimal places are rejected.
+        """
+        response = self.repay("0.001")
+        assert response.status_code == 400, "Expected status code 400"
+        assert "amount" in response.data["error"], "Expected an amount error"
+
+    def test_summary_amounts(self):
+        """
+        Tests that the summary returns exact amounts in major units.
+        """
+        assert self.repay("0.1").status_code == 201, "Expected status code 201"
+        self.create_credit_transaction(
+            contact=self.contact, amount=to_minor_units("1.25"), label="Other"
+        )
+        response = self.client.get("/user/summary", **self.headers)
+        summary = response.json()["data"][0]
+        assert summary["total_transaction_amount"] == 1.55, "Unexpected transaction total"
+        assert summary["total_repayment_amount"] == 0.1, "Unexpected repayment total"
+        assert summary["pending_amount"] == 1.45, "Unexpected pending amount"
+
+    def test_convert_amounts_to_minor_units(self):
+        """
+        Tests that the conversion scales amounts and recounts the paid amounts.
+        """
+        self.create_float_amounts()
+        stdout = StringIO()
+        self.convert_float_amounts(batch_size=1, stdout=stdout)
+        assert "Converted 1 repayments" in stdout.getvalue(), "Expected 1 repayment converted"
+        self.transaction.refresh_from_db()
+        assert self.transaction.amount == 300, "Expected the amount in minor units"
+        assert self.transaction.paid_amount == 100, "Expected the paid amount recounted"
+        assert Repayments.objects.get().amount == 100, "Expected the repayment in minor units"
+
+    def test_convert_repayments_before_transactions(self):
+        """
+        Tests that converting the models one at a time scales the paid amount once.
+        """
+        self.create_float_amounts()
+        for model in ("repayments", "transactions"):
+            self.convert_float_amounts(model=model, stdout=StringIO())
+        self.transaction.refresh_from_db()
+        assert self.transaction.amount == 300, "Expected the amount in minor units"
+        assert self.transaction.paid_amount == 100, "Expected the paid amount scaled once"
+
+    def test_convert_without_paid_amount_column(self):
+        """
+        Tests that the recount is left to backfill_paid_amounts before paid_amount is migrated.
+        """
+        Transactions.objects.filter(pk=self.transaction.pk).update(amount=3)
+        stdout = StringIO()
+        self.convert_float_amounts(
+            column_types={"amount": "FloatField"}, stdout=stdout
+        )
+        assert "run backfill_paid_amounts" in stdout.getvalue(), "Expected the backfill hint"
+        self.transaction.refresh_from_db()
+        assert self.transaction.amount == 300, "Expected the amount in minor units"
+
+    def test_convert_refuses_integer_columns(self):
+        """
+        Tests that the conversion refuses to run once the columns are integers.
+        """
+        Transactions.objects.filter(pk=self.transaction.pk).update(amount=3)
+        with self.assertRaises(CommandError):
+            call_command("convert_amounts_to_minor_units", stdout=StringIO())
+        self.transaction.refresh_from_db()
+        assert self.transaction.amount == 3, "Expected the amount left unchanged"
+
+
+class ListQueryCountTestCase(OwnerDataTestsMixin, APITestCase):
+    """
+    Query counts of list endpoints, which must not grow with the page size
+    """
+    def setUp(self):
+        super().setUp()
+        payment_method = self.create_payment_method()
+        for index in range(6):
+            transaction = self.create_credit_transaction(
+                contact=self.contact, amount=100, label=f"Transaction {index}"
+            )
+            for repayment_index in range(2):
+                Repayments.objects.create(
+                    label=f"Repayment {repayment_index}", transaction=transaction,
+                    amount=10, payment_method=payment_method
+                )
+        # Caches the token, so it is not looked up by the first counted request
+        self.client.get("/profile", **self.headers)
+
+    def count_queries(self, url: str, page_size: int) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                url, {"page": 1, "page_size": page_size}, **self.headers
+            )
+        assert response.status_code == 200, "Expected status code 200"
+        assert len(response.json()["data"]["results"]) == page_size, "Expected a full page"
+        return len(queries)
+
+    def test_transaction_list_query_count(self):
+        """
+        Tests that the transaction list runs as many queries for 6 rows as for 2.
+        """
+        assert self.count_queries("/user/transaction/", 2) == self.count_queries(
+            "/user/transaction/", 6
+        ), "Expected the query count not to grow with the page size"
+
+    def test_transaction_list_reads_prefetched_repayments(self):
+        """
+        Tests that each listed transaction carries its own repayments and amounts.
+        """
+        response = self.client.get(
+            "/user/transaction/", {"page": 1, "page_size": 6}, **self.headers
+        )
+        for transaction in response.json()["data"]["results"]:
+            assert len(transaction["repayments"]) == 2, "Expected 2 repayments"
+            assert transaction["paid_amount"] == float(to_major_units(20)), "Unexpected paid amount"
+            assert transaction["pending_amount"] == float(to_major_units(80)), "Unexpected pending amount"
+
+    def test_repayment_list_query_count(self):
+        """
+        Tests that the repayment list runs as many queries for 12 rows as for 2.
+        """
+        assert self.count_queries("/user/repayment/", 2) == self.count_queries(
+            "/user/repayment/", 12
+        ), "Expected the query count not to grow with the page size"
+
+
+class BulkTransactionsAPITestCase(OwnerDataTestsMixin, APITestCase):
+    """
+    Bulk transaction creation test cases
+    """
+    def setUp(self):
+        super().setUp()
+        self.url = "/user/transaction/bulk/"
+        self.payment_method = self.create_payment_method(owner=self.token.user)
+        # Caches the token, so it is not looked up by the first counted request
+        self.client.get("/profile", **self.headers)
+
+    def build_items(self, count: int, **kwargs) -> list:
+        return [
+            {
+                "label": f"Bulk Transaction {index}",
+                "contact": self.contact.pk,
+                "_type": TransactionTypeChoices.CREDIT.value,
+                "amount": "10.50",
+                "date": str(now()),
+                "payment_method": self.payment_method.pk,
+                **kwargs
+            }
+            for index in range(count)
+        ]
+
+    def post(self, items: list, **kwargs):
+        return self.client.post(
+            self.url, {"transactions": items, **kwargs},
+            content_type="application/json", **self.headers
+        )
+
+    def test_bulk_create_success(self):
+        """
+        Tests that every valid item is created and returned.
+        """
+        response = self.post(self.build_items(3))
+        assert response.status_code == 201, "Expected status code 201"
+        assert len(response.data["created"]) == 3, "Expected 3 transactions created"
+        assert response.data["errors"] == {}, "Expected no errors"
+        assert response.data["created"][0]["pending_amount"] == to_major_units(
+            1050
+        ), "Expected the amount pending"
+        assert response.data["created"][0]["repayments"] == [], "Expected no repayments"
+        assert Transactions.objects.filter(
+            contact=self.contact, amount=1050
+        ).count() == 3, "Expected 3 transactions stored in minor units"
+
+    def test_bulk_create_query_count(self):
+        """
+        Tests that the query count does not grow with the number of items.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            assert self.post(self.build_items(2)).status_code == 201, "Expected status code 201"
+        with self.assertNumQueries(len(queries)):
+            assert self.post(self.build_items(20)).status_code == 201, "Expected status code 201"
+        assert not [
+            query for query in queries.captured_queries
+            if Repayments._meta.db_table in query["sql"]
+        ], "Expected no repayments query for the new transactions"
+
+    def test_bulk_create_reports_invalid_items(self):
+        """
+        Tests that invalid items are reported by index while the valid ones are created.
+        """
+        other_contact = self.create_contact(
+            owner=self.create_user(username="other@example.com", email="other@example.com")
+        )
+        items = self.build_items(3)
+        items[1]["contact"] = other_contact.pk
+        items[2]["amount"] = "-1"
+        response = self.post(items)
+        assert response.status_code == 201, "Expected status code 201"
+        assert len(response.data["created"]) == 1, "Expected the valid item created"
+        assert set(response.data["errors"]) == {1, 2}, "Expected errors of items 1 and 2"
+        assert "contact" in response.data["errors"][1], "Expected a contact error"
+        assert "amount" in response.data["errors"][2], "Expected an amount error"
+
+    def test_bulk_create_all_or_nothing(self):
+        """
+        Tests that nothing is created when an item is invalid and all_or_nothing is set.
+        """
+        items = self.build_items(3)
+        items[1]["payment_method"] = 0
+        response = self.post(items, all_or_nothing=True)
+        assert response.status_code == 400, "Expected status code 400"
+        assert not Transactions.objects.exists(), "Expected no transactions created"
+
+    def test_bulk_create_uses_default_payment_method(self):
+        """
+        Tests that items without a payment method get the user's default one.
+        """
+        self.payment_method.is_default = True
+        self.payment_method.save()
+        response = self.post(self.build_items(1, payment_method=None))
+        assert response.status_code == 201, "Expected status code 201"
+        assert response.data["created"][0]["payment_method"] == self.payment_method.pk, (
+            "Expected the default payment method"
+        )
+
+    def test_bulk_create_invalidates_cached_list(self):
+        """
+        Tests that a bulk create invalidates the cached transaction list.
+        """
+        response = self.client.get("/user/transaction/", **self.headers)
+        assert len(response.json()["data"]) == 0, "Expected no transactions"
+        self.post(self.build_items(2))
+        response = self.client.get("/user/transaction/", **self.headers)
+        assert len(response.json()["data"]) == 2, "Expected the new transactions listed"
+
+    def test_bulk_create_without_items(self):
+        """
+        Tests that an empty list of items is rejected.
+        """
+        response = self.post([])
+        assert response.status_code == 400, "Expected status code 400"
+
+
+class UserResponseCacheTestCase(APITestCase, MainTestsMixin):
+    """
+    Per user response cache test cases
+    """
+    def setUp(self):
+        self.token = self.create_user_token()
+        self.headers = {"HTTP_AUTHORIZATION": f"Token {self.token.key}"}
+        self.contact = self.create_contact(
+            name=DEFAULT_CONTACT_NAME, owner=self.token.user
+        )
+        return super().setUp()
+
+    def test_cached_list_skips_database(self):
+        response = self.client.get("/user/contact/", **self.headers)
+        assert response.status_code == 200
+        with self.assertNumQueries(0):
+            response = self.client.get("/user/contact/", **self.headers)
+        assert response.status_code == 200
+        assert len(response.json()["data"]) == 1
+
+    def test_query_string_is_part_of_cache_key(self):
+        self.create_contact(name="Other Contact", owner=self.token.user)
+        response = self.client.get("/user/contact/", **self.headers)
+        assert len(response.json()["data"]) == 2
+        response = self.client.get(
+            "/user/contact/", {"search": "Other"}, **self.headers
+        )
+        assert len(response.json()["data"]) == 1
+
+    def test_write_invalidates_cached_list(self):
+        response = self.client.get("/user/contact/", **self.headers)
+        assert len(response.json()["data"]) == 1
+        response = self.client.post(
+            "/user/contact/", {"name": "New Contact", "groups": []},
+            content_type="application/json", **self.headers
+        )
+        assert response.status_code == 201
+        response = self.client.get("/user/contact/", **self.headers)
+        assert len(response.json()["data"]) == 2
+
+    def test_repayment_invalidates_cached_transactions(self):
+        transaction = self.create_credit_transaction(contact=self.contact)
+        response = self.client.get("/user/transaction/", **self.headers)
+        assert response.json()["data"][0]["pending_amount"] == float(to_major_units(transaction.amount))
+        self.create_repayment(transaction=transaction, amount=4)
+        response = self.client.get("/user/transaction/", **self.headers)
+        assert response.json()["data"][0]["pending_amount"] == float(to_major_units(transaction.amount - 4))
+
+    def test_cache_is_shared_between_user_tokens(self):
+        self.client.get("/user/contact/", **self.headers)
+        self.token.delete()
+        token = self.create_user_token(user=self.token.user)
+        headers = {"HTTP_AUTHORIZATION": f"Token {token.key}"}
+        self.client.get("/profile", **headers)
+        with self.assertNumQueries(0):
+            response = self.client.get("/user/contact/", **headers)
+        assert response.status_code == 200
+
+    def test_cached_response_bytes_are_served_unchanged(self):
+        response = self.client.get("/user/contact/", **self.headers)
+        cached_response = self.client.get("/user/contact/", **self.headers)
+        assert cached_response.content == response.content
+        assert cached_response["Content-Type"] == response["Content-Type"]
+
+    @override_settings(API_CACHE_MAX_SIZE=10)
+    def test_large_response_is_not_cached(self):
+        self.client.get("/user/contact/", **self.headers)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/user/contact/", **self.headers)
+        assert response.status_code == 200
+        assert len(queries), "Expected the response to be built again"
+
+    def test_cached_list_not_modified(self):
+        response = self.client.get("/user/contact/", **self.headers)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                "/user/contact/", HTTP_IF_NONE_MATCH=response["ETag"], **self.headers
+            )
+        assert response.status_code == 304
+
+    def test_cascaded_deletes_skip_owner_lookups(self):
+        transaction = self.create_credit_transaction(contact=self.contact)
+        for amount in (1, 2):
+            Repayments.objects.create(
+                label=DEFAULT_REPAYMET_LABEL, transaction=transaction,
+                amount=amount, payment_method=transaction.payment_method
+            )
+        with patch("user.signals.bump_user_data_version") as bump:
+            with CaptureQueriesContext(connection) as queries:
+                Contacts.objects.filter(pk=self.contact.pk).delete()
+        bump.assert_called_once_with(self.token.user.pk)
+        assert not [
+            query for query in queries.captured_queries
+            if query["sql"].startswith("SELECT") and "LIMIT 21" in query["sql"]
+        ], "Expected no owner lookup per deleted row"
+
+    def test_unrelated_models_are_fast_deleted(self):
+        collector = Collector(using="default")
+        assert collector.can_fast_delete(OTP.objects.all())
+        assert collector.can_fast_delete(TaskResult.objects.all())
+        assert not collector.can_fast_delete(Contacts.objects.all())
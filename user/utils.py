@@ -5,6 +5,7 @@ from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.utils.timezone import now
 
+from root.utils.response_cache import bump_user_data_version
 from user.models import ContactGroup, Contacts
 
 User = get_user_model()
@@ -33,6 +34,8 @@ def create_contacts_from_csv_file(file: InMemoryUploadedFile, user: User):
         contacts_objects.append(contact_object)
         counter += 1
     contacts = Contacts.objects.bulk_create(contacts_objects)
+    # bulk_create sends no signals, so cached responses are invalidated here
+    bump_user_data_version(user.pk)
     all_contacts = Contacts.objects.filter(
         owner=user
     ).exclude(data__Labels="")
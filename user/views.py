@@ -1,4 +1,6 @@
-from django.db.models import ExpressionWrapper, F, FloatField, Q, QuerySet, Sum
+from django.db.models import Prefetch, Q, QuerySet, Sum
+from django.utils.decorators import method_decorator
+from rest_framework.decorators import action
 from rest_framework.generics import CreateAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
@@ -6,16 +8,19 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
+from root.utils.response_cache import cache_per_user
+
 from .models import (ContactGroup, Contacts, PaymentMethods, PaymentSources,
                      Repayments, Transactions)
 from .permissions import (CanUpdateRepayment, CanUpdateTransaction,
                           IsAdminPaymentMethod, IsContactGroupOwner,
                           IsContactOwner, IsEmailVerified, IsOwnPaymentMethod,
                           IsOwnPaymentSource, IsOwnRepayment, IsOwnTransaction)
-from .serializers import (ContactGroupSerializer, ContactsSerializer,
-                          ImportContactsSerializer, PaymentMethodSerializer,
-                          PaymentSourcesSerializer, RepaymentsSerializer,
-                          SummarySerializer, TransactionsSerializer)
+from .serializers import (BulkTransactionsSerializer, ContactGroupSerializer,
+                          ContactsSerializer, ImportContactsSerializer,
+                          PaymentMethodSerializer, PaymentSourcesSerializer,
+                          RepaymentsSerializer, SummarySerializer,
+                          TransactionsSerializer)
 
 # Create your views here.
 
@@ -35,6 +40,7 @@ class ContactGroupViewSet(ModelViewSet):
         return queryset
 
 
+@method_decorator(cache_per_user("contacts"), name="list")
 class ContactsViewSet(ModelViewSet):
     serializer_class = ContactsSerializer
     permission_classes = (IsAuthenticated, IsEmailVerified, IsContactOwner)
@@ -45,6 +51,7 @@ class ContactsViewSet(ModelViewSet):
         return Contacts.objects.filter(owner=self.request.user)
 
 
+@method_decorator(cache_per_user("transactions"), name="list")
 class TransactionsViewSet(ModelViewSet):
     serializer_class = TransactionsSerializer
     permission_classes = (
@@ -55,7 +62,23 @@ class TransactionsViewSet(ModelViewSet):
     ordering = ("id",)
 
     def get_queryset(self) -> QuerySet[Transactions]:
-        return Transactions.objects.filter(contact__owner=self.request.user)
+        # Contact for the permissions and the repayments of a page in one
+        # query each, paid and pending amounts are columns
+        return Transactions.objects.filter(
+            contact__owner=self.request.user
+        ).select_related("contact").prefetch_related(
+            Prefetch("repayments", queryset=Repayments.objects.order_by("id"))
+        )
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request: Request) -> Response:
+        serializer = BulkTransactionsSerializer(
+            data=request.data, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        result = serializer.save()
+        # 400 only when no transaction could be created
+        return Response(result, status=201 if result["created"] else 400)
 
 
 class RepymentsViewSet(ModelViewSet):
@@ -71,7 +94,10 @@ class RepymentsViewSet(ModelViewSet):
     ordering = ("id",)
 
     def get_queryset(self) -> QuerySet[Repayments]:
-        return Repayments.objects.filter(transaction__contact__owner=self.request.user)
+        # The contact is read by the permissions and the cache invalidation
+        return Repayments.objects.filter(
+            transaction__contact__owner=self.request.user
+        ).select_related("transaction__contact")
 
 
 class PaymentMethodViewSet(ModelViewSet):
@@ -118,6 +144,7 @@ class ImportContactsFromCSVAPI(CreateAPIView):
         return Response(status, status=201)
 
 
+@method_decorator(cache_per_user("summary"), name="get")
 class SummaryAPIView(APIView):
     permission_classes = (IsAuthenticated, IsEmailVerified)
 
@@ -127,14 +154,8 @@ class SummaryAPIView(APIView):
             .filter(owner=request.user)
             .annotate(
                 total_transaction_amount=Sum("transactions__amount"),
-                total_repayment_amount=Sum("transactions__repayments__amount"),
-            )
-            .annotate(
-                pending_amount=ExpressionWrapper(
-                    F("total_transaction_amount") -
-                    F("total_repayment_amount"),
-                    output_field=FloatField(),
-                )
+                total_repayment_amount=Sum("transactions__paid_amount"),
+                pending_amount=Sum("transactions__pending_amount"),
             )
             .filter(pending_amount__gt=0)
             .order_by("-pending_amount")